@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+
+###
+# #%L
+# Codenjoy - it's a dojo-like platform from developers to developers.
+# %%
+# Copyright (C) 2018 Codenjoy
+# %%
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public
+# License along with this program.  If not, see
+# <http://www.gnu.org/licenses/gpl-3.0.html>.
+# #L%
+###
+
+"""
+asyncio client mode: the frame receiver, pings and the solver run as
+separate tasks. Boards that arrive while the solver is busy replace the
+waiting one, so the solver always works on the newest board. The solver
+is told how many boards it missed, its tick counters depend on them.
+"""
+
+import asyncio
+import base64
+import hashlib
+import socket
+import ssl
+import struct
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from sys import exc_info
+from time import perf_counter, time
+from traceback import print_exception
+from profiler import TickProfiler
+from webclient import format_startup
+from websocket import (ABNF, STATUS_NORMAL, WebSocketException, _create_sec_websocket_key,
+                       _parse_url)
+
+_ACCEPT_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+class AsyncWebClient:
+    """ Drop-in for WebClient, run_forever blocks until the connection closes.
+
+    solver, recorder and startup are taken the same way WebClient takes them.
+
+    profiler keeps per board "lag" (arrival to solver start), "solve" and
+    "total" times and the "coalesced" count of boards replaced unanswered.
+    """
+
+    def __init__(self, url, solver=None, recorder=None, ping_interval=0, startup=None):
+        self.url = url
+        self._solver = solver
+        self._recorder = recorder
+        self._startup = startup
+        self._ping_interval = ping_interval
+        self.profiler = TickProfiler()
+        self._writer = None
+        self._latest = None
+        self._board_ready = None
+        self._coalesced = 0
+
+    def run_forever(self):
+        asyncio.run(self.run())
+
+    async def run(self):
+        try:
+            reader = await self._connect()
+        except (OSError, WebSocketException) as e:
+            print(e)
+            return
+        print("Opened Connection.")
+        if self._startup is not None:
+            self._startup.setdefault("connected", perf_counter())
+        if isinstance(self._solver, Future):
+            self._solver = self._solver.result()
+        if isinstance(self._recorder, Future):
+            self._recorder = self._recorder.result()
+        if self._recorder:
+            self._recorder.new_game()
+        self._board_ready = asyncio.Event()
+        # the solver gets its own thread, it is not safe to run concurrently
+        executor = ThreadPoolExecutor(max_workers=1)
+        tasks = [asyncio.create_task(self._solve_loop(executor))]
+        if self._ping_interval:
+            tasks.append(asyncio.create_task(self._ping_loop()))
+        try:
+            await self._receive_loop(reader)
+        except (OSError, asyncio.IncompleteReadError, WebSocketException) as e:
+            print(e)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            executor.shutdown(wait=True)
+            self._writer.close()
+            print("WebSocket closed.")
+
+    async def _connect(self):
+        hostname, port, resource, is_secure = _parse_url(self.url)
+        context = ssl.create_default_context() if is_secure else None
+        reader, self._writer = await asyncio.open_connection(hostname, port, ssl=context)
+        key = _create_sec_websocket_key()
+        hostport = hostname if port in (80, 443) else "%s:%d" % (hostname, port)
+        self._writer.write(("GET %s HTTP/1.1\r\n"
+                            "Upgrade: websocket\r\n"
+                            "Connection: Upgrade\r\n"
+                            "Host: %s\r\n"
+                            "Origin: http://%s\r\n"
+                            "Sec-WebSocket-Key: %s\r\n"
+                            "Sec-WebSocket-Version: 13\r\n\r\n"
+                            % (resource, hostport, hostport, key)).encode("utf-8"))
+        response = (await reader.readuntil(b"\r\n\r\n")).decode("utf-8").split("\r\n")
+        status = response[0].split(" ", 2)
+        if len(status) < 2 or status[1] != "101":
+            raise WebSocketException("Handshake Status %s" % response[0])
+        headers = {}
+        for line in response[1:]:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        digest = hashlib.sha1((key + _ACCEPT_GUID).encode("utf-8")).digest()
+        if headers.get("sec-websocket-accept") != base64.b64encode(digest).decode("utf-8"):
+            raise WebSocketException("Invalid WebSocket Header")
+        self._writer.transport.get_extra_info("socket").setsockopt(
+            socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return reader
+
+    def send(self, data, opcode=ABNF.OPCODE_TEXT):
+        self._writer.write(ABNF.create_frame(data, opcode).format())
+
+    async def _read_frame(self, reader):
+        header = await reader.readexactly(2)
+        length = header[1] & 0x7f
+        if length == 0x7e:
+            length = struct.unpack("!H", await reader.readexactly(2))[0]
+        elif length == 0x7f:
+            length = struct.unpack("!Q", await reader.readexactly(8))[0]
+        mask_key = await reader.readexactly(4) if header[1] >> 7 else None
+        payload = await reader.readexactly(length)
+        if mask_key:
+            payload = ABNF.mask(mask_key, payload)
+        return header[0] >> 7, header[0] & 0xf, payload
+
+    async def _receive_loop(self, reader):
+        fragments = []
+        while True:
+            fin, opcode, payload = await self._read_frame(reader)
+            if opcode in (ABNF.OPCODE_TEXT, ABNF.OPCODE_CONT):
+                fragments.append(payload)
+                if fin:
+                    self._on_board(b"".join(fragments).decode("utf-8"), perf_counter(), time())
+                    fragments = []
+            elif opcode == ABNF.OPCODE_PING:
+                self.send(payload, ABNF.OPCODE_PONG)
+            elif opcode == ABNF.OPCODE_CLOSE:
+                self.send(struct.pack("!H", STATUS_NORMAL), ABNF.OPCODE_CLOSE)
+                await self._writer.drain()
+                return
+
+    def _on_board(self, message, arrived_at, timestamp):
+        if self._latest is not None:
+            self._coalesced += 1
+        self._latest = (message.lstrip("board="), arrived_at, timestamp)
+        self._board_ready.set()
+
+    async def _solve_loop(self, executor):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._board_ready.wait()
+            self._board_ready.clear()
+            board, arrived_at, timestamp = self._latest
+            self._latest = None
+            self.profiler.start_tick()
+            self.profiler.add_time("lag", perf_counter() - arrived_at)
+            skipped, self._coalesced = self._coalesced, 0
+            self.profiler.count("coalesced", skipped)
+            try:
+                with self.profiler.phase("solve"):
+                    command = await loop.run_in_executor(
+                        executor, partial(self._solver.get, board, arrived_at=arrived_at,
+                                          skipped=skipped))
+                self.send(command)
+                if self._startup and "first_command" not in self._startup:
+                    self._startup["first_command"] = perf_counter()
+                    print(format_startup(self._startup))
+                if self._recorder:
+                    self._recorder.record(board, command, timestamp, perf_counter() - arrived_at)
+                if hasattr(self._solver, "speculate") and self._latest is None:
+                    await loop.run_in_executor(executor, self._solver.speculate)
+            except Exception as e:
+                print("Exception occurred")
+                print(e)
+                print_exception(*exc_info())
+            self.profiler.end_tick()
+
+    async def _ping_loop(self):
+        while True:
+            await asyncio.sleep(self._ping_interval)
+            self.send(b"", ABNF.OPCODE_PING)
+
+
+if __name__ == '__main__':
+    raise RuntimeError("This module is not designed to be ran from CLI.")
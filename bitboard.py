@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+###
+# #%L
+# Codenjoy - it's a dojo-like platform from developers to developers.
+# %%
+# Copyright (C) 2018 Codenjoy
+# %%
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public
+# License along with this program.  If not, see
+# <http://www.gnu.org/licenses/gpl-3.0.html>.
+# #L%
+###
+
+"""
+Board element classes as integer bitsets.
+
+Bit i of a bitset is the cell y * size + x. Python integers are arbitrary
+precision, so a shift or a mask handles the whole board in one operation:
+blast rays and flood fills run per step instead of per cell.
+"""
+
+import numpy as np
+from element import _CODES
+from point import PointGrid
+
+
+def from_mask(mask):
+    """ Return the bitset of a boolean array, flattened in [y, x] order."""
+    packed = np.packbits(np.ravel(mask), bitorder='little')
+    return int.from_bytes(packed.tobytes(), 'little')
+
+
+def to_masks(bitsets, size):
+    """ Return a (len(bitsets), size * size) boolean array, a row per bitset."""
+    cells = size * size
+    width = (cells + 7) // 8
+    data = np.frombuffer(b''.join(bits.to_bytes(width, 'little') for bits in bitsets), dtype=np.uint8)
+    return np.unpackbits(data.reshape(len(bitsets), width), axis=1, count=cells, bitorder='little').view(bool)
+
+
+class BitBoard:
+    """ Bitsets of a board, built once per element class on first use."""
+    _columns = {}
+
+    def __init__(self, board):
+        self.size = board._size
+        self.full = (1 << self.size * self.size) - 1
+        self._codes = board.as_array().ravel()
+        self._points = PointGrid.for_size(self.size)
+        self._bits = {}
+        columns = self._columns.get(self.size)
+        if columns is None:
+            first = sum(1 << (y * self.size) for y in range(self.size))
+            columns = self._columns[self.size] = (self.full & ~first, self.full & ~(first << (self.size - 1)))
+        # shifting along x must not wrap into the next row
+        self._not_first, self._not_last = columns
+
+    def of(self, chars):
+        """ Return the bitset of the cells holding one of the element chars."""
+        key = frozenset(chars)
+        bits = self._bits.get(key)
+        if bits is None:
+            lut = np.zeros(256, dtype=bool)
+            lut[[_CODES[c] for c in key]] = True
+            bits = self._bits[key] = from_mask(lut[self._codes])
+        return bits
+
+    def barriers(self):
+        """ Return the cells a blast or a player can not pass through."""
+        # board imports this module, resolve it on first use
+        from board import _BARRIERS
+        return self.of(_BARRIERS)
+
+    def bit(self, pnt):
+        return 1 << self._points.index(pnt)
+
+    def from_points(self, points):
+        bits = 0
+        for pnt in points:
+            if not pnt.is_bad(self.size):
+                bits |= 1 << self._points.index(pnt)
+        return bits
+
+    def points(self, bits):
+        """ Yields the points of the set bits in board order."""
+        while bits:
+            low = bits & -bits
+            yield self._points.at(low.bit_length() - 1)
+            bits ^= low
+
+    def to_masks(self, bitsets):
+        return to_masks(bitsets, self.size)
+
+    def neighbours(self, bits):
+        """ Return the cells next to the bits, the bits themselves excluded."""
+        around = ((bits << 1) & self._not_first) | ((bits >> 1) & self._not_last) | \
+                 ((bits << self.size) & self.full) | (bits >> self.size)
+        return around & ~bits
+
+    def rays(self, origins, rng, stop):
+        """ Return (passed, stopped) of the rays in all four directions."""
+        size, not_first, not_last = self.size, self._not_first, self._not_last
+        free = self.full & ~stop
+        passed = stopped = 0
+        right = left = down = up = origins
+        for _ in range(rng):
+            # one shift per direction, this is the hot loop of BlastMap
+            right = (right << 1) & not_first
+            left = (left >> 1) & not_last
+            down = (down << size) & self.full
+            up >>= size
+            cur = right | left | down | up
+            if not cur:
+                break
+            stopped |= cur & stop
+            right &= free
+            left &= free
+            down &= free
+            up &= free
+            passed |= right | left | down | up
+        return passed, stopped
+
+
+if __name__ == '__main__':
+    raise RuntimeError("This module is not designed to be ran from CLI")
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+
+###
+# #%L
+# Codenjoy - it's a dojo-like platform from developers to developers.
+# %%
+# Copyright (C) 2018 Codenjoy
+# %%
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public
+# License along with this program.  If not, see
+# <http://www.gnu.org/licenses/gpl-3.0.html>.
+# #L%
+###
+
+from heapq import heapify, heappop
+import numpy as np
+from element import Element
+
+# Timers are not shown for bombs under bombermans, assume the worst
+# for the other players and a fresh bomb for ours.
+OTHER_BOMB_BOMBERMAN_TIMER = 1
+BOMB_BOMBERMAN_TIMER = 5
+
+
+class BlastMap:
+    """ Earliest tick each cell of the board explodes at.
+
+    Bombs are detonated in the order of their timers, a bomb caught in
+    the blast of another one explodes on the same tick (chain reaction).
+    """
+    NEVER = 255
+
+    def __init__(self, board, bombs=None, blast_range=None):
+        """ Build the map for the bombs on the board.
+
+        bombs is an optional dict of point -> (timer, range) which adds
+        or overrides bombs found on the board. The bombs on the board
+        reach blast_range cells, Board.BLAST_RANGE by default.
+        """
+        self._board = board
+        self._range = blast_range or board.BLAST_RANGE
+        self._size = board._size
+        self._bits = board.get_bitboard()
+        self.ticks = np.full((self._size, self._size), self.NEVER, dtype=np.uint8)
+        self._timers = {}
+        self._covered = {}
+        self._hits = {}
+        self._bombs = self._board_bombs()
+        self._bombs.update(bombs or {})
+        self._detonate(self._bombs)
+
+    def _board_bombs(self):
+        rng = self._range
+        bombs = {}
+        for timer in range(1, 6):
+            for pnt in self._board.get_bombs_by_timer(timer):
+                bombs[pnt] = (timer, rng)
+        for pnt in self._board._find_all(Element('BOMB_BOMBERMAN')):
+            bombs[pnt] = (BOMB_BOMBERMAN_TIMER, rng)
+        for pnt in self._board._find_all(Element('OTHER_BOMB_BOMBERMAN')):
+            bombs[pnt] = (OTHER_BOMB_BOMBERMAN_TIMER, rng)
+        return bombs
+
+    def _detonate(self, bombs):
+        """ Explode the bombs a tick at a time.
+
+        All bombs going off on a tick cast their rays together, the bombs
+        the rays stop at join the next wave of the same tick.
+        """
+        bits = self._bits
+        by_bit = {}
+        for pnt in bombs:
+            if not pnt.is_bad(self._size):
+                by_bit[bits.bit(pnt)] = pnt
+        bomb_bits = 0
+        for bit in by_bit:
+            bomb_bits |= bit
+        # bombs stop the rays like barriers do
+        self._stop = bits.barriers() | bomb_bits
+        heap = [(timer, i, pnt) for i, (pnt, (timer, _)) in enumerate(bombs.items())]
+        heapify(heap)
+        while heap:
+            tick = heap[0][0]
+            wave = []
+            while heap and heap[0][0] == tick:
+                wave.append(heappop(heap)[2])
+            covered = hits = 0
+            while wave:
+                origins = {}
+                for bomb in wave:
+                    if bomb in self._timers:
+                        continue
+                    self._timers[bomb] = tick
+                    if not bomb.is_bad(self._size):
+                        rng = bombs[bomb][1]
+                        origins[rng] = origins.get(rng, 0) | bits.bit(bomb)
+                triggered = 0
+                for rng, origin in origins.items():
+                    passed, stopped = bits.rays(origin, rng, self._stop)
+                    covered |= origin | passed
+                    hits |= stopped
+                    triggered |= stopped & bomb_bits
+                wave = []
+                while triggered:
+                    low = triggered & -triggered
+                    wave.append(by_bit[low])
+                    triggered ^= low
+            if covered:
+                self._covered[tick] = covered
+            # the bombs a ray stops at explode themselves
+            hits &= ~bomb_bits
+            if hits:
+                self._hits[tick] = hits
+        # earlier ticks are written last and win
+        order = sorted(self._covered, reverse=True)
+        flat = self.ticks.reshape(-1)
+        for tick, hit in zip(order, bits.to_masks([self._covered[tick] for tick in order])):
+            flat[hit] = tick
+
+    def get(self, pnt):
+        """ Return the tick the point explodes at, NEVER if it is safe."""
+        if pnt.is_bad(self._size):
+            return self.NEVER
+        return int(self.ticks[pnt.get_y(), pnt.get_x()])
+
+    def get_rays(self, bomb):
+        """ Return the points hit by the bomb, the bomb itself excluded."""
+        if bomb not in self._timers or bomb.is_bad(self._size):
+            return set()
+        passed, _ = self._bits.rays(self._bits.bit(bomb), self._bombs[bomb][1], self._stop)
+        return set(self._bits.points(passed))
+
+    def get_points(self, max_tick=None):
+        """ Return the points exploding not later than max_tick."""
+        points = {bomb for bomb, tick in self._timers.items()
+                  if max_tick is None or tick <= max_tick}
+        covered = 0
+        for tick, bits in self._covered.items():
+            if max_tick is None or tick <= max_tick:
+                covered |= bits
+        points.update(self._bits.points(covered))
+        return points
+
+    def get_hits(self, max_tick=None):
+        """ Return a boolean array of the barrier cells a ray stops at not
+        later than max_tick, walls, choppers and players.
+        """
+        hits = 0
+        for tick, bits in self._hits.items():
+            if max_tick is None or tick <= max_tick:
+                hits |= bits
+        return self._bits.to_masks([hits])[0].reshape(self._size, self._size)
+
+    def get_mask(self, max_tick=None):
+        """ Return a boolean array of the cells exploding not later than max_tick."""
+        if max_tick is None:
+            return self.ticks != self.NEVER
+        return self.ticks <= max_tick
+
+
+if __name__ == '__main__':
+    raise RuntimeError("This module is not designed to be ran from CLI")
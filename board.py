@@ -22,33 +22,230 @@
 # #L%
 ###
 
+from bisect import insort
 from math import sqrt
-from point import Point
-from element import Element
+from collections import defaultdict
+import numpy as np
+from point import Point, PointGrid
+from element import Element, _ELEMENTS, _CODES, _BY_CHAR
+from blast import BlastMap
+from bitboard import BitBoard
+
+
+_BOMB_TIMERS = {
+    _ELEMENTS['BOMB_TIMER_1']: 1,
+    _ELEMENTS['BOMB_TIMER_2']: 2,
+    _ELEMENTS['BOMB_TIMER_3']: 3,
+    _ELEMENTS['BOMB_TIMER_4']: 4,
+    _ELEMENTS['BOMB_TIMER_5']: 5,
+}
+_PLAYERS = {
+    _ELEMENTS['OTHER_BOMBERMAN'],
+    _ELEMENTS['OTHER_BOMB_BOMBERMAN'],
+    _ELEMENTS['OTHER_DEAD_BOMBERMAN'],
+}
+_PERKS = {
+    _ELEMENTS['BOMB_BLAST_RADIUS_INCREASE'],
+    _ELEMENTS['BOMB_COUNT_INCREASE'],
+    _ELEMENTS['BOMB_IMMUNE'],
+    _ELEMENTS['BOMB_REMOTE_CONTROL'],
+}
+_BARRIERS = {
+    _ELEMENTS['WALL'],
+    _ELEMENTS['DESTROY_WALL'],
+    _ELEMENTS['MEAT_CHOPPER'],
+    _ELEMENTS['BOMB_BOMBERMAN'],
+} | set(_BOMB_TIMERS) | _PLAYERS
+
+# Boards differing from the previous one in more cells are indexed from scratch
+DIFF_LIMIT = 64
+
+# Lookup table from unicode code point to element code, unknown chars
+# are read as empty space, the ones past the table hit its last entry
+_UNKNOWN = max(map(ord, _CODES)) + 1
+_CODE_LUT = np.full(_UNKNOWN + 1, _CODES[_ELEMENTS['NONE']], dtype=np.uint8)
+for _c, _code in _CODES.items():
+    _CODE_LUT[ord(_c)] = _code
+# Element chars by code, for turning codes back into a board string
+_CODE_CHARS = np.array([_c for _c in _CODES], dtype='<U1')
+
+
+def encode(board_string):
+    """ Return the flat uint8 array of element codes for a board string."""
+    chars = np.frombuffer(board_string.replace('\n', '').encode('utf-32-le'), dtype=np.uint32)
+    return _CODE_LUT[np.minimum(chars, _UNKNOWN)]
+
+
+def decode(codes):
+    """ Return the board string for a flat array of element codes."""
+    return ''.join(_CODE_CHARS[codes].tolist())
 
 
 class Board:
     BLAST_RANGE = 3
 
     """ Class describes the Board field for Bomberman game."""
-    def __init__(self, board_string):
+    def __init__(self, board_string, previous = None):
+        """ previous is the board of the tick before, if given the index
+        is patched with the changed cells instead of built from scratch.
+        """
         self._string = board_string.replace('\n', '')
         self._len = len(self._string)  # the length of the string
         self._size = int(sqrt(self._len))  # size of the board 
         #print("Board size is sqrt", self._len, self._size)
+        self._array = None
+        self._bitboard = None
+        self._codes = encode(self._string)
+        self._points = PointGrid.for_size(self._size)
+        self._changes = None
+        if previous is not None and previous._len == self._len:
+            changed = np.flatnonzero(self._codes != previous._codes)
+            if len(changed) <= DIFF_LIMIT:
+                self._patch_index(previous, changed.tolist())
+                return
+        self._build_index()
+
+    def _build_index(self):
+        """ Walks the board string once and groups points by element char.
+
+        Empty cells are not indexed, nobody asks for them and they are
+        the majority of the board.
+        """
+        self._index = defaultdict(list)
+        self._barriers = set()
+        self._bombs_by_timer = defaultdict(list)
+        self._players = set()
+        self._perks = set()
+        _none = _ELEMENTS['NONE']
+        for i, c in enumerate(self._string):
+            if c == _none:
+                continue
+            pnt = self._strpos2pt(i)
+            self._index[c].append(pnt)
+            if c in _BARRIERS:
+                self._barriers.add(pnt)
+            if c in _BOMB_TIMERS:
+                self._bombs_by_timer[_BOMB_TIMERS[c]].append(pnt)
+            elif c in _PLAYERS:
+                self._players.add(pnt)
+            elif c in _PERKS:
+                self._perks.add(pnt)
+
+    def _patch_index(self, previous, changed):
+        """ Takes over the index of the previous board and moves the changed
+        cells. Point lists stay in board order and the sets are rebuilt in
+        it, so iteration order is the same as of a board built from scratch.
+        """
+        self._index = defaultdict(list, previous._index)
+        self._barriers = set(previous._barriers)
+        self._bombs_by_timer = defaultdict(list, previous._bombs_by_timer)
+        players = self._players = previous._players
+        perks = self._perks = previous._perks
+        self._changes = []
+        # lists shared with the previous board are copied before the first change
+        own_index = set()
+        own_timers = set()
+        key = self._points.index
+        for i in changed:
+            pnt = self._strpos2pt(i)
+            old, new = previous._string[i], self._string[i]
+            self._changes.append((pnt, _BY_CHAR.get(old), _BY_CHAR.get(new)))
+            for c, add in ((old, False), (new, True)):
+                if c == _ELEMENTS['NONE']:
+                    continue
+                if c not in own_index:
+                    self._index[c] = list(self._index[c])
+                    own_index.add(c)
+                timer = _BOMB_TIMERS.get(c)
+                if timer and timer not in own_timers:
+                    self._bombs_by_timer[timer] = list(self._bombs_by_timer[timer])
+                    own_timers.add(timer)
+                if add:
+                    insort(self._index[c], pnt, key=key)
+                    if c in _BARRIERS:
+                        self._barriers.add(pnt)
+                    if timer:
+                        insort(self._bombs_by_timer[timer], pnt, key=key)
+                else:
+                    self._index[c].remove(pnt)
+                    self._barriers.discard(pnt)
+                    if timer:
+                        self._bombs_by_timer[timer].remove(pnt)
+                if c in _PLAYERS:
+                    players = self._players = None
+                elif c in _PERKS:
+                    perks = self._perks = None
+        if players is None:
+            self._players = self._collect(_PLAYERS)
+        if perks is None:
+            self._perks = self._collect(_PERKS)
+
+    def _collect(self, chars):
+        """ Return the set of points of the chars, added in board order."""
+        points = [pnt for c in chars for pnt in self._index.get(c, ())]
+        return set(sorted(points, key=self._points.index))
+
+    def get_changes(self):
+        """ Return [(point, old Element, new Element)] for the cells changed
+        since the previous board, None if the board was indexed from scratch.
+        """
+        return self._changes
+
+    def as_array(self):
+        """ Return the board decoded to a (size, size) array of element codes.
+
+        The array is indexed as [y, x] and is built once per board.
+        """
+        if self._array is None:
+            self._array = self._codes.reshape(self._size, self._size)
+        return self._array
+
+    def get_bitboard(self):
+        """ Return the board as bitsets of element classes, built once per board."""
+        if self._bitboard is None:
+            self._bitboard = BitBoard(self)
+        return self._bitboard
+
+    def get_mask(self, chars):
+        """ Return a boolean array, True where one of the chars is."""
+        lut = np.zeros(len(_CODES), dtype=bool)
+        lut[[_CODES[c] for c in chars]] = True
+        return lut[self.as_array()]
+
+    def get_barrier_mask(self):
+        return self.get_mask(_BARRIERS)
+
+    def get_passable_mask(self):
+        return ~self.get_barrier_mask()
+
+    def get_bomb_mask(self):
+        return self.get_mask(set(_BOMB_TIMERS) | {_ELEMENTS['BOMB_BOMBERMAN']})
+
+    def get_perk_mask(self):
+        return self.get_mask(_PERKS)
+
+    def get_player_mask(self):
+        return self.get_mask(_PLAYERS)
+
+    def points_mask(self, points):
+        """ Return a boolean array, True at the given points.
+
+        Points out of the board are skipped.
+        """
+        mask = np.zeros((self._size, self._size), dtype=bool)
+        xy = [pnt.get() for pnt in points if not pnt.is_bad(self._size)]
+        if xy:
+            xs, ys = zip(*xy)
+            mask[ys, xs] = True
+        return mask
 
     def _find_all(self, element):
         """ Returns the list of points for the given element type."""
-        _points = []
-        _a_char = element.get_char()
-        for i, c in enumerate(self._string):
-            if c == _a_char:
-                _points.append(self._strpos2pt(i))
-        return _points
+        return list(self._index.get(element.get_char(), ()))
 
     def get_at(self, x, y):
         """ Return an Element object at coordinates x,y."""
-        return Element(self._string[self._xy2strpos(x, y)])
+        return _BY_CHAR[self._string[self._xy2strpos(x, y)]]
 
     def get(self, pnt):
         return self.get_at(pnt.get_x(), pnt.get_y())
@@ -56,11 +253,11 @@ class Board:
 
     def is_at(self, x, y, element_object):
         """ Return True if Element is at x,y coordinates."""
-        return element_object == self.get_at(x, y)
+        return element_object.get_char() == self._string[self._xy2strpos(x, y)]
 
     def is_barrier_at(self, x, y):
         """ Return true if barrier is at x,y."""
-        return Point(x, y) in self.get_barriers()
+        return Point(x, y) in self._barriers
 
     def is_my_bomberman_dead(self):
         """ Returns False if your bomberman still alive."""
@@ -77,11 +274,7 @@ class Board:
 
     def get_other_bombermans(self):
         """ Return the list of points for other bombermans."""
-        points = set()
-        points.update(self._find_all(Element('OTHER_BOMBERMAN')))
-        points.update(self._find_all(Element('OTHER_BOMB_BOMBERMAN')))
-        points.update(self._find_all(Element('OTHER_DEAD_BOMBERMAN')))
-        return points
+        return set(self._players)
 
     def get_meat_choppers(self):
         return self._find_all(Element('MEAT_CHOPPER'))
@@ -91,13 +284,7 @@ class Board:
 
     def get_barriers(self):
         """ Return the list of barriers Points."""
-        points = set()
-        points.update(self.get_walls())
-        points.update(self.get_bombs())
-        points.update(self.get_destroy_walls())
-        points.update(self.get_meat_choppers())
-        points.update(self.get_other_bombermans())
-        return list(points)
+        return list(self._barriers)
 
     def get_walls(self):
         """ Retuns the list of walls Element Points."""
@@ -113,23 +300,22 @@ class Board:
 
     def get_bombs(self, about_to_explode = False):
         """ Returns the list of bombs points."""
-        points = set()
-        points.update(self._find_all(Element('BOMB_TIMER_1')))
+        points = set(self._bombs_by_timer[1])
         if not about_to_explode:
-            points.update(self._find_all(Element('BOMB_TIMER_2')))
-            points.update(self._find_all(Element('BOMB_TIMER_3')))
-            points.update(self._find_all(Element('BOMB_TIMER_4')))
-            points.update(self._find_all(Element('BOMB_TIMER_5')))
+            for timer in (2, 3, 4, 5):
+                points.update(self._bombs_by_timer[timer])
             points.update(self._find_all(Element('BOMB_BOMBERMAN')))
         return list(points)
 
+    def get_bombs_by_timer(self, timer):
+        """ Returns the list of bombs points with the given timer."""
+        return list(self._bombs_by_timer[timer])
+
     def get_bombs_to_destroy(self):
         """ Returns the list of bombs points."""
         points = set()
-        points.update(self._find_all(Element('BOMB_TIMER_1')))
-        points.update(self._find_all(Element('BOMB_TIMER_2')))
-        points.update(self._find_all(Element('BOMB_TIMER_3')))
-        points.update(self._find_all(Element('BOMB_TIMER_4')))
+        for timer in (1, 2, 3, 4):
+            points.update(self._bombs_by_timer[timer])
         points.update(self._find_all(Element('BOMB_BOMBERMAN')))
         return list(points)
 
@@ -137,24 +323,11 @@ class Board:
         return self._find_all(Element('BOOM'))
 
     def get_future_blasts(self, about_to_explode = False):
-        _bombs = set()
-        _bombs.update(self.get_bombs(about_to_explode))
-        _bombs.update(self._find_all(Element('OTHER_BOMB_BOMBERMAN')))
-        _points = set()
-        for _bomb in _bombs:
-            _bx, _by = _bomb.get_x(), _bomb.get_y()
-            _points.add(_bomb)
-            _points.update(self._search_blasts(_bomb))
-        return _points
+        return BlastMap(self).get_points(1 if about_to_explode else None)
 
     def get_perks(self):
         """ Returns the list of points with Perks."""
-        points = set()
-        points.update(self._find_all(Element('BOMB_BLAST_RADIUS_INCREASE')))
-        points.update(self._find_all(Element('BOMB_COUNT_INCREASE')))
-        points.update(self._find_all(Element('BOMB_IMMUNE')))
-        points.update(self._find_all(Element('BOMB_REMOTE_CONTROL')))
-        return points
+        return set(self._perks)
 
     def is_near(self, x, y, elem):
         _is_near = False
@@ -193,7 +366,7 @@ class Board:
                           for i in range(0, self._len, self._size)])
 
     def _strpos2pt(self, strpos):
-        return Point(*self._strpos2xy(strpos))
+        return self._points.at(strpos)
 
     def _strpos2xy(self, strpos):
         return (strpos % self._size, strpos // self._size)
@@ -201,29 +374,19 @@ class Board:
     def _xy2strpos(self, x, y):
         return self._size * y + x
 
+    def get_neighbours(self, pnt):
+        """ Return the points around pnt which are on the board."""
+        return self._points.neighbours(pnt)
+
     def walk_in_bomb_range(self, bomb_point, rng, f):
-        for search_range, is_x in ((range(bomb_point.get_x()+1, bomb_point.get_x() + rng + 1), True),
-                                   (range(bomb_point.get_x()-1, bomb_point.get_x() - rng - 1, -1), True),
-                                   (range(bomb_point.get_y()+1, bomb_point.get_y() + rng + 1), False),
-                                   (range(bomb_point.get_y()-1, bomb_point.get_y() - rng - 1, -1), False)):
-            for i in search_range:
-                current_point = Point(i, bomb_point.get_y()) if is_x else Point(bomb_point.get_x(), i)
-                if current_point.is_bad(self._size) or \
-                        f(current_point):
+        x0, y0 = bomb_point.get()
+        for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+            for i in range(1, rng + 1):
+                x, y = x0 + dx * i, y0 + dy * i
+                if x < 0 or y < 0 or x >= self._size or y >= self._size or \
+                        f(self._points.get(x, y)):
                     break
 
-    def _search_blasts(self, bomb_point):
-        points = set()
-        walls = set(self.get_barriers())
-        def f(pnt):
-            if pnt in walls:
-               return True 
-            points.add(pnt)
-
-        self.walk_in_bomb_range(bomb_point, self.BLAST_RANGE, f)
-
-        return points
-
 
 if __name__ == '__main__':
     raise RuntimeError("This module is not designed to be ran from CLI")
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+
+###
+# #%L
+# Codenjoy - it's a dojo-like platform from developers to developers.
+# %%
+# Copyright (C) 2018 Codenjoy
+# %%
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public
+# License along with this program.  If not, see
+# <http://www.gnu.org/licenses/gpl-3.0.html>.
+# #L%
+###
+
+from dataclasses import dataclass
+import numpy as np
+from point import Point
+
+DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+STAY = (0, 0)
+
+# Choppers keep their heading while the way is free and turn at random
+# now and then, or when they run into something.
+TURN_CHANCE = 0.1
+HORIZON = 3
+HISTORY = 4
+# probabilities are stored as bytes, 255 is certain
+LEVELS = 255
+
+
+@dataclass
+class Track:
+    """ A chopper followed across ticks, history holds its last (dx, dy) moves."""
+    pnt: Point
+    history: tuple = ()
+
+    @property
+    def heading(self):
+        return self.history[-1] if self.history else None
+
+
+def _step(pnt, step):
+    return Point(pnt.get_x() + step[0], pnt.get_y() + step[1])
+
+
+def _move_cost(step, heading):
+    """ Cost of a chopper with the heading making the (dx, dy) step."""
+    if step == STAY:
+        return 2
+    return 0 if step == heading else 1
+
+
+def assign(costs):
+    """ Minimum cost matching with as many pairs as possible.
+
+    costs is a list with a {target: cost} dict per source. Returns a dict
+    source index -> target. Shortest augmenting paths are searched with
+    Bellman-Ford, the graphs are a few dozens of nodes at most.
+    """
+    wanted = [t for options in costs for t in options]
+    if len(wanted) == len(set(wanted)):
+        # no target is shared, every source takes its cheapest one
+        return {i: min(options, key=options.get) for i, options in enumerate(costs) if options}
+    matched = {}  # source -> target
+    owner = {}  # target -> source
+    for _ in range(len(costs)):
+        dist = {('s', i): 0 for i in range(len(costs)) if i not in matched}
+        parent = {}
+        changed = True
+        while changed:
+            changed = False
+            for node, d in list(dist.items()):
+                kind, key = node
+                if kind == 's':
+                    edges = [(('t', t), c) for t, c in costs[key].items() if matched.get(key) != t]
+                elif key in owner:
+                    edges = [(('s', owner[key]), -costs[owner[key]][key])]
+                else:
+                    edges = []
+                for nxt, c in edges:
+                    if d + c < dist.get(nxt, float('inf')):
+                        dist[nxt] = d + c
+                        parent[nxt] = node
+                        changed = True
+        free = [(d, key) for (kind, key), d in dist.items() if kind == 't' and key not in owner]
+        if not free:
+            break
+        node = ('t', min(free, key=lambda x: x[0])[1])
+        while node in parent:
+            source = parent[node]
+            if node[0] == 't':
+                matched[source[1]] = node[1]
+                owner[node[1]] = source[1]
+            node = source
+    return matched
+
+
+class ChopperTracker:
+    """ Follows choppers across ticks and predicts where they go.
+
+    occupancy[t] is the chance of a chopper on each cell t ticks ahead
+    in LEVELS, occupancy[0] being the current positions. Ticks past the
+    first are spread on the first query, see layer(). The updates rebind
+    the attributes, a shallow copy of the tracker is independent.
+    """
+
+    def __init__(self, horizon=HORIZON):
+        self.horizon = horizon
+        self.tracks = []
+        self.predictions = {}
+        self.occupancy = None
+        self._spread = None
+
+    def update(self, choppers, free):
+        """ choppers are the chopper points of the board, free is a [y, x]
+        boolean array of the cells a chopper can step on.
+        """
+        choppers = list(choppers)
+        index = {pnt: i for i, pnt in enumerate(choppers)}
+        costs = []
+        for track in self.tracks:
+            options = {}
+            for step in (STAY,) + DIRECTIONS:
+                i = index.get(_step(track.pnt, step))
+                if i is not None:
+                    options[i] = _move_cost(step, track.heading)
+            costs.append(options)
+        tracks = [Track(pnt) for pnt in choppers]
+        for source, target in assign(costs).items():
+            old = self.tracks[source]
+            step = choppers[target] - old.pnt
+            history = old.history if step == STAY else (old.history + (step,))[-HISTORY:]
+            tracks[target] = Track(choppers[target], history)
+        self.tracks = tracks
+        self._predict(free)
+
+    def _predict(self, free):
+        """ Place the tracks on the heading layers of the chance.
+
+        The chance is kept per heading, the last layer holds the choppers
+        with an unknown one.
+        """
+        size = free.shape[0]
+        # opts[d] is 1 where the cell in direction d is free, in DIRECTIONS order
+        opts = np.zeros((len(DIRECTIONS), size, size), dtype=np.float32)
+        opts[0, :, :-1] = free[:, 1:]
+        opts[1, :, 1:] = free[:, :-1]
+        opts[2, :-1] = free[1:]
+        opts[3, 1:] = free[:-1]
+        count = opts.sum(axis=0)
+        stuck = count == 0
+        share = (~stuck) / np.maximum(count, 1)
+        chance = np.zeros((len(DIRECTIONS) + 1, size, size), dtype=np.float32)
+        self.predictions = {}
+        for track in self.tracks:
+            x, y = track.pnt.get()
+            heading = DIRECTIONS.index(track.heading) if track.heading else len(DIRECTIONS)
+            chance[heading, y, x] += 1
+            if track.heading and opts[heading, y, x]:
+                self.predictions[track.pnt] = _step(track.pnt, track.heading)
+        self.occupancy = np.zeros((self.horizon + 1, size, size), dtype=np.uint8)
+        self._spread = [chance, opts, opts * (1 - TURN_CHANCE), share, stuck]
+        self._ready = 0
+        self._store(chance.sum(axis=0))
+
+    def _store(self, total):
+        # any chance at all stays above zero
+        self.occupancy[self._ready] = np.ceil(np.minimum(total, 1) * LEVELS)
+        self._ready += 1
+        self._total = total
+
+    def layer(self, t):
+        """ Return occupancy[t], the horizon beyond it."""
+        t = min(t, self.horizon)
+        if self.tracks:
+            while self._ready <= t:
+                chance, opts, keep, share, stuck = self._spread
+                # keep going with 1 - TURN_CHANCE when the way is free, the
+                # rest of the chance spreads evenly over the free directions
+                ahead = chance[:-1] * keep
+                moving = ahead + (self._total - ahead.sum(axis=0)) * share * opts
+                chance = chance * stuck
+                # each heading layer steps its way
+                chance[0, :, 1:] += moving[0, :, :-1]
+                chance[1, :, :-1] += moving[1, :, 1:]
+                chance[2, 1:] += moving[2, :-1]
+                chance[3, :-1] += moving[3, 1:]
+                self._spread[0] = chance
+                self._store(chance.sum(axis=0))
+        return self.occupancy[t]
+
+    def mask(self, t, threshold):
+        """ Return a boolean array of the cells with a chopper chance of at
+        least threshold t ticks ahead, the horizon is used beyond it.
+        """
+        return self.layer(t) >= threshold * LEVELS
+
+    def cost_layer(self, penalty, t=1):
+        """ Return an int array of penalty scaled by the chopper chance."""
+        occupancy = self.layer(t).astype(np.int32)
+        return (occupancy * penalty + LEVELS - 1) // LEVELS
+
+
+if __name__ == '__main__':
+    raise RuntimeError("This module is not designed to be ran from CLI")
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+###
+# #%L
+# Codenjoy - it's a dojo-like platform from developers to developers.
+# %%
+# Copyright (C) 2018 Codenjoy
+# %%
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public
+# License along with this program.  If not, see
+# <http://www.gnu.org/licenses/gpl-3.0.html>.
+# #L%
+###
+
+import numpy as np
+from board import _PERKS
+
+
+class CostGrid:
+    """ Movement cost matrix for path search, built from board masks.
+
+    A cell cost of 0 means the cell is not walkable. Penalty layers are
+    given either as boolean masks or as iterables of points.
+    """
+    WALKABLE = 100
+    PERK = 1
+    CHOPPER_PENALTY = 5000
+    BLAST_FACTOR = 10
+
+    def __init__(self, board, not_passable, matrix=None):
+        self._board = board
+        self._not_passable = not_passable
+        self._perks = False
+        if matrix is None:
+            matrix = np.where(board.get_mask(not_passable), 0, self.WALKABLE).astype(np.int32)
+        self.matrix = matrix
+
+    def copy(self):
+        grid = CostGrid(self._board, self._not_passable, self.matrix.copy())
+        grid._perks = self._perks
+        return grid
+
+    def patched(self, board, changes):
+        """ Return a copy for the next board, only the changed cells are
+        recomputed. changes are Board.get_changes() of that board, the grid
+        must not have penalty layers.
+        """
+        grid = self.copy()
+        grid._board = board
+        for pnt, _, new in changes:
+            char = new.get_char() if new else None
+            if char in self._not_passable:
+                cost = 0
+            elif self._perks and char in _PERKS:
+                cost = self.PERK
+            else:
+                cost = self.WALKABLE
+            grid.matrix[pnt.get_y(), pnt.get_x()] = cost
+        return grid
+
+    def _as_mask(self, layer):
+        if isinstance(layer, np.ndarray):
+            return layer
+        return self._board.points_mask(layer)
+
+    def add_perks(self):
+        self.matrix[self._board.get_perk_mask()] = self.PERK
+        self._perks = True
+        return self
+
+    def add_penalty(self, layer, penalty):
+        self.matrix[self._as_mask(layer)] += penalty
+        return self
+
+    def add_costs(self, costs):
+        """ Add an int array of costs to the walkable cells."""
+        walkable = self.matrix > 0
+        self.matrix[walkable] += costs[walkable]
+        return self
+
+    def scale(self, layer, factor):
+        self.matrix[self._as_mask(layer)] *= factor
+        return self
+
+    def block(self, layer):
+        self.matrix[self._as_mask(layer)] = 0
+        return self
+
+
+if __name__ == '__main__':
+    raise RuntimeError("This module is not designed to be ran from CLI")
@@ -22,22 +22,28 @@
 # #L%
 ###
 
+import copy
 import logging
-from time import time
+import numpy as np
+from time import time, perf_counter
 from random import choice
-from board import Board
-from element import Element
+from board import Board, decode
+from cost_grid import CostGrid
+from blast import BlastMap
+from element import Element, code_of
 from direction import Direction, _DIRECTIONS
 from point import Point
 import random
-from itertools import product
 from collections import defaultdict
 from dataclasses import dataclass
 import traceback
-
-from pathfinding.core.diagonal_movement import DiagonalMovement
-from pathfinding.core.grid import Grid
-from pathfinding.finder.a_star import AStarFinder
+from distance import DistanceField, ReusedField
+from choppers import ChopperTracker
+from yield_map import YieldMap
+from planner import IncrementalPlanner
+from escape import EscapePlanner
+from profiler import TickProfiler
+from logqueue import LazyStr, start_queue_logging
 from element import _ELEMENTS
 from enum import Enum
 
@@ -124,28 +130,37 @@ class PerkInfo:
                                                 ds._perks)))
         if ds._me in self._prev_perks:
             perk_pickedup = Perk(self._prev_perks[ds._me])
-            logger.info(f"Perk picked up:{perk_pickedup}")
+            ds.log.info(f"Perk picked up:{perk_pickedup}")
             if perk_pickedup == Perk.RANGE:
-                self.current_perks[perk_pickedup] += PERK_DURATION
+                self.current_perks[perk_pickedup] += ds.config.perk_duration
                 self._range += RANGE_INC
             elif perk_pickedup == Perk.RC:
                 self.current_perks[perk_pickedup] = 3
             else:
-                self.current_perks[perk_pickedup] = PERK_DURATION
+                self.current_perks[perk_pickedup] = ds.config.perk_duration
 
         for perk in list(self.current_perks.keys()):
             perk = Perk(perk)
             if perk == Perk.RC:
                 continue
-            self.current_perks[perk] -= 1
+            # the boards the solver skipped count as well
+            self.current_perks[perk] -= 1 + ds._skipped
             if self.current_perks[perk] <= 0:
                 if perk == Perk.RANGE:
                     self._range = 0
                 del self.current_perks[perk]
         self._prev_perks = perks_info
-        logger.info(f"Current perks: {self.current_perks} range: {self._range}")
+        ds.log.info(f"Current perks: {self.current_perks} range: {self._range}")
         
 BOMB_TIMEOUT = 5
+# Cells exploding within this many ticks are not walkable
+ABOUT_TO_EXPLODE = 1
+# How many ticks ahead the escape path is planned
+ESCAPE_HORIZON = BOMB_TIMEOUT + 2
+
+_BOMB_TIMER_CHARS = {_ELEMENTS["BOMB_TIMER_%d" % t]: t for t in range(1, BOMB_TIMEOUT + 1)}
+_BOMB_HOLDERS = {_ELEMENTS["BOMB_BOMBERMAN"], _ELEMENTS["OTHER_BOMB_BOMBERMAN"]}
+
 
 class MyBombInfo:
     def __init__(self):
@@ -168,11 +183,11 @@ class MyBombInfo:
 
     def update(self, ds):
         if self.rc_placed and ds._prev_move.act():
-            logger.info("RC Detonated!")
+            ds.log.info("RC Detonated!")
             self.reset()
             return 
 
-        if ds._board.get_at(ds._me.get_x(), ds._me.get_y()).get_char() == _ELEMENTS["BOMB_BOMBERMAN"]:
+        if ds._board.get_at(ds._me.get_x(), ds._me.get_y()) == Element("BOMB_BOMBERMAN"):
             self.pnt = ds._me
             self._placed = BOMB_TIMEOUT
         elif ds._prev_move.act():
@@ -187,22 +202,26 @@ class MyBombInfo:
 
         if not self.rc_placed:
             if self._placed != 0:
-                self._placed -= 1
+                self._placed = max(0, self._placed - 1 - ds._skipped)
                 if not self._placed:
                     self.pnt = None
 
-        self.danger = self._danger_places(ds)
-
-    def _danger_places(self, ds):
-        points = set()
-        if self.pnt:
-            walls = set(ds._board.get_barriers())
-            def f(pnt):
-                if pnt in walls:
-                   return True 
-                points.add(pnt)
-            ds._board.walk_in_bomb_range(self.pnt, ds._board.BLAST_RANGE + ds._perks_info.get_range(), f)
-        return points
+    def get_bomb(self, ds):
+        """ Returns our bomb as {point: (timer, range)} for the blast map."""
+        if not self.pnt:
+            return {}
+        timer = BOMB_TIMEOUT if self.rc_placed else self._placed
+        # the board shows the timer of a bomb nobody stands on, it beats
+        # our count, and a cell without a bomb means it has gone off
+        shown = ds._board.get_at(self.pnt.get_x(), self.pnt.get_y()).get_char()
+        if shown in _BOMB_TIMER_CHARS:
+            timer = _BOMB_TIMER_CHARS[shown]
+        elif shown not in _BOMB_HOLDERS:
+            return {}
+        return {self.pnt: (timer, ds.config.blast_range + ds._perks_info.get_range())}
+
+    def update_danger(self, blasts):
+        self.danger = blasts.get_rays(self.pnt) if self.pnt else set()
 
 @dataclass
 class Chopper:
@@ -214,49 +233,76 @@ class ChoppersInfo:
         self.reset()
 
     def reset(self):
-        self._prev_choppers= set()
         self._choppers = set()
         self.mad_choppers = set()
         self.dead_choppers = set()
-        self._predicted_moves = set()
+        self.tracker = ChopperTracker()
+        self.predictions = {}
+        # no board seen yet, nothing is in danger
+        self._near = None
+        self._risk = SolverConfig.chopper_risk
+        self._size = 0
+        self._danger = [[]]
+        self._danger_masks = [np.zeros((0, 0), dtype=bool)]
 
     def update(self, ds):
         dead_choppers = set(ds._board.get_dead_choppers())
         self.mad_choppers = dead_choppers - self._choppers
-        logger.debug(f"aaah Mad choppers: {self.mad_choppers}")
-        self._choppers = set(ds._board.get_meat_choppers())
-        predicted_moves = []
-        chops_copy = self._choppers.copy()
-        walls = ds._walls.union(ds._destroy_walls).union(ds._board.get_blasts()).union(ds._board.get_destroied_walls())
-        predicted_moves = []
-        for chop in self._choppers:
-            chops_sur = chop.surrounding_pnts()
-            possible_moves = [(pnt, pnt in self._prev_choppers) for pnt in chops_sur]
-            possible_moves = list(filter(lambda x: x[1], possible_moves))
-            if len(possible_moves) != 1:
-                continue
-            chops_copy.remove(chop)
-            chopper_vec = chop - possible_moves[0][0]
-            chopper_move = chop + Point(*chopper_vec)
-            logger.debug(f"Choppper {chop} predicted pos: {chopper_move}")
-            if chopper_move in walls:
-                chopper_moves = [pnt for pnt in chop.surrounding_pnts() if pnt not in walls]
-                logger.debug(f"chopper {chop} meet wall, possible moves: {chopper_moves}")
-                predicted_moves += chopper_moves
-            else:
-                predicted_moves.append(chopper_move)
-        
-
-        logger.debug(f"Unpredicted choppers:{chops_copy}")
-        for chop in chops_copy:
-            chopper_moves = [pnt for pnt in chop.surrounding_pnts() if pnt not in walls]
-            predicted_moves += chopper_moves
-        logger.debug(f"Predicted moves:{predicted_moves}")
-        self._predicted_moves = predicted_moves
-
-        
-
-        self._prev_choppers = self._choppers
+        ds.log.debug("aaah Mad choppers: %s", self.mad_choppers)
+        choppers = ds._board.get_meat_choppers()
+        self._choppers = set(choppers)
+        if ds._skipped:
+            # the steps between the boards are unknown, start the tracks over
+            self.tracker = ChopperTracker()
+        self.tracker.update(choppers, ~ds._board.get_mask(CHOPPER_BLOCKERS))
+        self.predictions = self.tracker.predictions
+        ds.log.debug("Chopper tracks: %s", self.tracker.tracks)
+
+        mad_moves = [pnt for chop in self.mad_choppers for pnt in ds._board.get_neighbours(chop)]
+        ds.log.debug("Mad choppers moves:%s", mad_moves)
+        # where a chopper is or a mad one may step, whatever the forecast says
+        self._near = ds._board.points_mask(self._choppers) | ds._board.points_mask(mad_moves)
+        self._risk = ds.config.chopper_risk
+        self._size = ds._board._size
+        self._danger_masks = [ds._board.points_mask(self._choppers)]
+        self._danger = [self._danger_masks[0].ravel().tolist()]
+
+    def _danger_at(self, t):
+        """ Flat list of the cells a chopper may be at t ticks ahead, built on first use."""
+        if self._near is None:
+            return self._danger[0]
+        t = min(t, self.tracker.horizon)
+        while len(self._danger) <= t:
+            # the next tick is kept at risk later on, the chance spreads thin
+            mask = self.tracker.mask(len(self._danger), self._risk) | self.tracker.mask(1, self._risk) | self._near
+            self._danger_masks.append(mask)
+            self._danger.append(mask.ravel().tolist())
+        return self._danger[t]
+
+    def danger_mask(self, t):
+        """ Boolean [y, x] array of the cells a chopper may be at t ticks ahead."""
+        self._danger_at(t)
+        return self._danger_masks[min(t, len(self._danger_masks) - 1)]
+
+    def is_danger(self, pnt, t):
+        """ True if a chopper may be at the point t ticks ahead."""
+        if pnt.is_bad(self._size):
+            return False
+        return self._danger_at(t)[pnt.get_y() * self._size + pnt.get_x()]
+
+    def add_costs(self, grid, penalty):
+        """ Add the chopper costs of the next tick to the CostGrid.
+
+        Cells with a chopper or next to a mad one take the full penalty,
+        blocked or not, the forecast scales it on the walkable cells at
+        risk. Unlikely cells are left alone, they would change every tick
+        and keep the incremental planner busy.
+        """
+        if self._near is None:
+            return
+        grid.add_penalty(self._near, penalty)
+        at_risk = self.tracker.mask(1, self._risk) & ~self._near
+        grid.add_costs(np.where(at_risk, self.tracker.cost_layer(penalty), 0))
 
 
 DESTROY_MODES = [Mode.KILL, Mode.ROAMING]
@@ -272,25 +318,77 @@ NOT_PASSIBLE = {
     _ELEMENTS["BOMB_TIMER_5"],
     _ELEMENTS["DEAD_MEAT_CHOPPER"],
     }
+CHOPPER_BLOCKERS = {
+    _ELEMENTS["WALL"],
+    _ELEMENTS["DESTROY_WALL"],
+    _ELEMENTS["DESTROYED_WALL"],
+    _ELEMENTS["BOOM"],
+    _ELEMENTS["BOMB_BOMBERMAN"],
+    _ELEMENTS["OTHER_BOMB_BOMBERMAN"],
+    _ELEMENTS["BOMB_TIMER_1"],
+    _ELEMENTS["BOMB_TIMER_2"],
+    _ELEMENTS["BOMB_TIMER_3"],
+    _ELEMENTS["BOMB_TIMER_4"],
+    _ELEMENTS["BOMB_TIMER_5"],
+    }
 
 
-def setup_logging():
+def setup_logging(non_blocking = True):
+    """ With non_blocking the handlers write from a background thread.
+
+    A level set on the bot logger beforehand is kept, bot.log is opened
+    with the first record.
+    """
     logger = logging.getLogger("bot")
-    logger.setLevel(logging.DEBUG)
+    if logger.level == logging.NOTSET:
+        logger.setLevel(logging.DEBUG)
     formatter = logging.Formatter('%(asctime)s:  %(message)s')
 
     hndl = logging.StreamHandler()
     hndl.setFormatter(formatter)
     hndl.setLevel(logging.INFO)
-    fh = logging.FileHandler("bot.log")
+    fh = logging.FileHandler("bot.log", delay=True)
     fh.setFormatter(formatter)
     fh.setLevel(logging.DEBUG)
-    logger.addHandler(hndl)
-    logger.addHandler(fh)
+    if non_blocking:
+        start_queue_logging(logger, [hndl, fh])
+    else:
+        logger.addHandler(hndl)
+        logger.addHandler(fh)
     return logger
-    
-logger = setup_logging()
+
+# handlers are set up by the first DirectionSolver, not on import
+logger = logging.getLogger("bot")
+_logging_ready = False
+
+
+class _QuietLog:
+    """ Stands in for the logger on a quiet solver, drops debug and info."""
+    def _drop(self, *args, **kwargs):
+        pass
+
+    debug = info = _drop
+
+    def __getattr__(self, name):
+        return getattr(logger, name)
+
+
+_QUIET_LOG = _QuietLog()
     
+@dataclass
+class SolverConfig:
+    """ Tunable parameters of DirectionSolver."""
+    blast_range: int = BLAST_RANGE
+    perk_duration: int = PERK_DURATION
+    safe_moves: int = 5
+    perk_radius: int = 8
+    wall_yield: int = 1
+    player_yield: int = 20
+    chopper_yield: int = 10
+    chopper_penalty: int = CostGrid.CHOPPER_PENALTY
+    chopper_risk: float = 0.2
+    blast_factor: int = CostGrid.BLAST_FACTOR
+
 @dataclass
 class ModeInfo():
     mode: Mode
@@ -310,10 +408,38 @@ DIR_TO_VECTOR = {
     RIGHT: Point(1,0),
 }
 
+class DeadlineExceeded(Exception):
+    """ Raised when the tick deadline passes while deciding."""
+    pass
+
+
 class DirectionSolver:
     """ This class should contain the movement generation algorithm."""
 
-    def __init__(self):
+    def __init__(self, deadline = None, config = None, speculative = False):
+        """ deadline is the decision budget in seconds from the frame arrival.
+
+        With a deadline the solver works in anytime mode: a cheap safe move
+        is computed first and refined until the budget runs out. config is
+        a SolverConfig with the tunables, defaults are used if not given.
+        With speculative speculate() precomputes the next tick. A quiet
+        solver skips its debug and info logging.
+        """
+        global _logging_ready
+        if not _logging_ready:
+            setup_logging()
+            _logging_ready = True
+        self.deadline = deadline
+        self.config = config or SolverConfig()
+        self.speculative = speculative
+        self.quiet = False
+        self._skipped = 0
+        self._speculation = None
+        self._arrived_at = None
+        self._frame_gap = None
+        self._speculation_time = 0.0
+        self._tick_deadline = None
+        self._best_moves = NextMoves()
         self._direction = None
         self._board = None
         self._last = None
@@ -330,6 +456,15 @@ class DirectionSolver:
         self._perks_info = PerkInfo()
         self._prev_move = NextMoves()
         self._walls = set()
+        self._field = None
+        self._yields = None
+        self._base_grid = None
+        self._planner = IncrementalPlanner()
+        self.profiler = TickProfiler()
+
+    @property
+    def log(self):
+        return _QUIET_LOG if self.quiet else logger
     
     @staticmethod
     def get_direction(pnt_from, pnt_to):
@@ -348,10 +483,6 @@ class DirectionSolver:
     def direction_to_point(self, dr):
         return self._me + DIR_TO_VECTOR.get(dr)
 
-    @staticmethod
-    def _replace_walls(s):
-        return 0 if s in NOT_PASSIBLE else 100
-
     def get_quadrant(self, pnt: Point):
         sz = self._board._size // 2
         x, y = pnt.get()
@@ -364,33 +495,28 @@ class DirectionSolver:
             place = self._me
         is_immune = self._perks_info.get(Perk.IMMUNE) > 1
         return \
-               (is_immune or place not in self._future_blasts) and \
+               (is_immune or self._blasts.get(place) > ABOUT_TO_EXPLODE) and \
                place not in self.choppers.mad_choppers and \
-               place not in self._next_choppers_moves
+               not self.choppers.is_danger(place, 1)
                #place not in self._board.get_barriers() and \
                #place not in self.choppers._choppers and \
 
-    def get_path(self, to_pnt: Point, grid = None):
-        if not grid:
-            grid = self._make_grid()
-        pnt = grid.node(self._me.get_x(), self._me.get_y())
-        pnt.walkable = True
-        target_node = grid.node(to_pnt.get_x(), to_pnt.get_y())
-        target_node.walkable = True
-        finder = AStarFinder(diagonal_movement=DiagonalMovement.never)
-        path, runs = finder.find_path(pnt, target_node, grid)
-        self._grid = grid
-        return path
+    def get_path(self, to_pnt: Point):
+        return self._distance_field().get_path(to_pnt)
 
-    def _make_grid(self):
-        return Grid(matrix=self._matrix)
+    def _distance_field(self):
+        """ Distances from our bomberman, built on the first query of the tick."""
+        if not self._field:
+            self._field = self._build_field()
+        return self._field
 
-    def get_other_player_path(self, afk_players):
-        grid = Grid(matrix=self._matrix)
-        self._grid = grid
-        pnt = grid.node(self._me.get_x(), self._me.get_y())
-        pnt.walkable = True
+    def _build_field(self):
+        with self.profiler.phase("path_search"):
+            field = DistanceField(self._matrix, self._me)
+        self.profiler.count("path_searches")
+        return field
 
+    def get_other_player_path(self, afk_players):
         if not afk_players:
             return None
 
@@ -398,73 +524,30 @@ class DirectionSolver:
             
             if self._victim and self._victim  == bomber:
                 continue
-            path = self.get_path(bomber, grid)
+            path = self.get_path(bomber)
             if path:
-                #logger.debug(grid.grid_str(path=path,start=pnt))
                 return path
-            grid.cleanup()
         return None
         
-    def get_safe_place(self, radius = 5):
-        places = []
-        for dx, dy in product(range(-radius, radius+1), range(-radius, radius)):
-            place = Point(self._me.get_x() + dx, self._me.get_y()+dy)
-            #place not in self._board.get_barriers() and \
-            if not place.is_bad(self._board._size) and \
-                place not in self.choppers._predicted_moves and \
-                place not in self._future_blasts and \
-                place not in self._bomb.danger:
-                places.append(place)
-        places = sorted(places, key = lambda x: x.distance(self._me), reverse = True)
-        return places
-
-    def get_good_place(self, places):
-        grid = Grid(matrix=self._matrix)
-        self._grid = grid
-        path_list = []
-        for place in places:
-            path = self.get_path(place, grid)
-            grid.cleanup()
-            if path:
-                path_list.append(path)
-        return path_list
-
     def get_potential_yield(self, current_point):
-        pnts = 0
-        points = {
-            _ELEMENTS["DESTROY_WALL"]: 1,
-            _ELEMENTS["OTHER_BOMBERMAN"]: 20,
-            _ELEMENTS["MEAT_CHOPPER"]: 10,
-        }
+        return self._yield_map().get(current_point)
+
+    def _yield_map(self):
+        """ Bomb yields of the whole board, built on the first query of the tick."""
+        if self._yields is None:
+            with self.profiler.phase("yields"):
+                self._yields = YieldMap(self._board,
+                                        self.config.blast_range + self._perks_info.get_range(),
+                                        self.choppers.mad_choppers,
+                                        self.config.wall_yield,
+                                        self.config.player_yield,
+                                        self.config.chopper_yield)
+        return self._yields
+
+    def get_bomb_spot(self):
+        """ Return the reachable point where a bomb pays the most per step."""
+        return self._yield_map().best(self._distance_field().as_array())
 
-        break_el = [Element("WALL"), Element("DESTROY_WALL")]
-
-        def get_points(pnt: Point):
-            if pnt.is_bad(self._board._size):
-                return True, 0
-            if pnt in self.choppers.mad_choppers:
-                return True, 10
-            el = self._board.get_at(pnt.get_x(), pnt.get_y())
-            return el in break_el, points.get(el.get_char(), 0)
-        blast_range = BLAST_RANGE + self._perks_info.get_range()
-        ranges = [range(1, blast_range+1), range(-1, -blast_range-1 , -1)]
-        for rg in ranges:
-            for dx in rg:
-                pnt = Point(current_point.get_x()+dx, current_point.get_y())
-                brk, _pnts = get_points(pnt)
-                pnts += _pnts
-                if brk:
-                    break
-            for dy in rg:
-                pnt = Point(current_point.get_x(), current_point.get_y()+dy)
-                _pnts = get_points(pnt)
-                brk, _pnts = get_points(pnt)
-                pnts += _pnts
-                if brk:
-                    break
-
-        return pnts
-    
     def get_walls_density(self):
         walls_dens = defaultdict(list)
         for wall in self._destroy_walls:
@@ -480,6 +563,12 @@ class DirectionSolver:
         return Point(random.randrange(*x_range), random.randrange(*y_range))
 
     def get_roaming_point(self):
+        spot = self.get_bomb_spot()
+        if spot is not None:
+            walls = self._yield_map().get_targets(spot)
+            logger.info(f"bomb spot {spot}, yield {self._yield_map().get(spot)}, walls {walls}")
+            if walls:
+                return walls
         walls_dens = self.get_walls_density()
         points = set()
         if not walls_dens:
@@ -493,18 +582,9 @@ class DirectionSolver:
         logger.info(list(map(lambda x: x.distance(self._me),points)))
         return points
     
-    def get_potential_chopper_moves(self):
-        mad_choppers_moves = []
-        for mad_chopper in self.choppers.mad_choppers:
-            for pnt in mad_chopper.surrounding_pnts():
-                if not pnt.is_bad(self._board._size):
-                    mad_choppers_moves.append(pnt)
-        logger.debug(f"Mad choppers moves:{mad_choppers_moves}")
-        return set(self.choppers._predicted_moves).union(mad_choppers_moves).union(self.choppers._choppers)
-
     def get_near_perks(self):
-        PERK_RADIUS = 8
-        logger.debug(f"Perks: {self._perks}")
+        PERK_RADIUS = self.config.perk_radius
+        logger.debug("Perks: %s", self._perks)
         #perks = filter(lambda x: self._board.get(x).get_char() != _ELEMENTS["BOMB_REMOTE_CONTROL"],  self._perks)
         perks = self._perks
         perks = sorted(list(filter(lambda x: self._me.distance(x) <= PERK_RADIUS, perks)), key = lambda x: x.distance(self._me))
@@ -512,74 +592,238 @@ class DirectionSolver:
 
     def get_near_perk_path(self):
         near_perks = self.get_near_perks()
-        grid = self._make_grid()
         for perk in near_perks:
-            path = self.get_path(perk, grid)
+            path = self.get_path(perk)
             if path:
                 return path
-            grid.cleanup()
 
-    def _make_matrix(self):
-        matrix = self._board._line_by_line().split('\n')
-        for i,val in enumerate(matrix):
-            matrix[i] = list(map(self._replace_walls, val))
-        perks = self._board.get_perks()
-        for perk in perks:
-            matrix[perk.get_y()][perk.get_x()] = 1
-
-        chopper_move = self.get_potential_chopper_moves()
-        self._next_choppers_moves = chopper_move
+    def _make_matrix(self, changes = None):
+        """ changes are the board changes, the walls and perks layer of the
+        previous tick is patched with them."""
+        if changes is None or self._base_grid is None:
+            self._base_grid = CostGrid(self._board, NOT_PASSIBLE).add_perks()
+        else:
+            self._base_grid = self._base_grid.patched(self._board, changes)
+        grid = self._base_grid.copy()
 
-        for ch_move in chopper_move:
-            matrix[ch_move.get_y()][ch_move.get_x()]+= 5000
+        self.choppers.add_costs(grid, self.config.chopper_penalty)
 
-        future_blasts = self._board.get_future_blasts()
         if self._perks_info.get(Perk.IMMUNE) < 4:
-            for fb in future_blasts.union(self._bomb.danger):
-                matrix[fb.get_y()][fb.get_x()] *= 10
+            grid.scale(self._blasts.get_mask(), self.config.blast_factor)
+            grid.block(self._blasts.get_mask(ABOUT_TO_EXPLODE))
+        return grid.matrix
 
-        future_blasts = self._board.get_future_blasts(True)
-        if self._bomb.placed == 2:
-            future_blasts = future_blasts.union(self._bomb.danger)
 
-        self._future_blasts = future_blasts
-        if self._perks_info.get(Perk.IMMUNE) < 4:
-            for fb in self._future_blasts:
-                matrix[fb.get_y()][fb.get_x()] = 0
-        return matrix
+    def _check_deadline(self):
+        if self._tick_deadline is not None and perf_counter() > self._tick_deadline:
+            raise DeadlineExceeded()
 
+    def _offer(self, moves):
+        """ Remember moves as the best decision of the tick so far."""
+        self._best_moves = moves
 
-    def get_deco(f):
-        def wrapper(self, board_string):
-            import time
-            start_time = time.time()
-            self._count +=1
-            logger.info(f"{10*'-'} tick: {self._count}")
-            board = Board(board_string)
+    def _safe_fallback(self):
+        if self.is_place_safe():
+            return NextMoves()
+        panic_path = self.panic_path()
+        if panic_path:
+            return NextMoves(self.get_direction(self._me, Point(*panic_path[1])))
+        return NextMoves()
+
+    def _prepare(self, board_string):
+        """ Parse the board and build the per-tick structures."""
+        prof = self.profiler
+        with prof.phase("parse"):
+            board = Board(board_string, self._board)
+            changes = board.get_changes()
             self._board = board
             self._me = board.get_bomberman()
-            self._destroy_walls = set(board.get_destroy_walls())
-            self._walls = set(board.get_walls())
+            # walls change rarely, rebuilt sets keep the iteration order
+            changed = {c.get_char() for cells in changes for c in cells[1:] if c} \
+                if changes is not None else None
+            if changed is None or _ELEMENTS["DESTROY_WALL"] in changed:
+                self._destroy_walls = set(board.get_destroy_walls())
+            if changed is None or _ELEMENTS["WALL"] in changed:
+                self._walls = set(board.get_walls())
 
             self._other_players = board.get_other_bombermans()
             self._perks = board.get_perks()
+        with prof.phase("perks"):
             self._perks_info.update(self)
+        with prof.phase("bomb"):
             self._bomb.update(self)
+        with prof.phase("blasts"):
+            self._blasts = BlastMap(board, self._bomb.get_bomb(self), self.config.blast_range)
+            self._bomb.update_danger(self._blasts)
+        with prof.phase("choppers"):
             self.choppers.update(self)
 
-            self._matrix = self._make_matrix()
-            logger.info(self._board.to_string())
-            logger.debug(f"Bomb info: {self._bomb}")
+        with prof.phase("matrix"):
+            self._matrix = self._make_matrix(changes)
+        self._field = None
+        self._yields = None
+
+    def _predict_board(self):
+        """ Return the board string expected on the next tick, None if unsure.
+
+        Our last move is applied, bomb timers count down, bombs due now
+        explode, blasts and wrecks clear up and choppers with a known heading
+        step on. Everything else is expected to stay in place.
+        """
+        if self._board.is_my_bomberman_dead():
+            return None
+        current = self._board.as_array()
+        codes = current.copy()
+        for char in ("BOOM", "DESTROYED_WALL", "DEAD_MEAT_CHOPPER"):
+            codes[current == code_of(_ELEMENTS[char])] = code_of(_ELEMENTS["NONE"])
+        for timer in range(2, BOMB_TIMEOUT + 1):
+            codes[current == code_of(_ELEMENTS["BOMB_TIMER_%d" % timer])] = \
+                code_of(_ELEMENTS["BOMB_TIMER_%d" % (timer - 1)])
+        explode = self._blasts.get_mask(1)
+        if explode[self._me.get_y(), self._me.get_x()]:
+            return None
+        codes[explode] = code_of(_ELEMENTS["BOOM"])
+        hits = self._blasts.get_hits(1)
+        for char, wreck in (("DESTROY_WALL", "DESTROYED_WALL"), ("MEAT_CHOPPER", "DEAD_MEAT_CHOPPER")):
+            codes[hits & (current == code_of(_ELEMENTS[char]))] = code_of(_ELEMENTS[wreck])
+
+        free = {code_of(_ELEMENTS["NONE"])} | {code_of(perk.value) for perk in Perk}
+        for chop, move in self.choppers.predictions.items():
+            if codes[chop.get_y(), chop.get_x()] == code_of(_ELEMENTS["MEAT_CHOPPER"]) and \
+               not move.is_bad(self._board._size) and codes[move.get_y(), move.get_x()] in free:
+                codes[chop.get_y(), chop.get_x()] = code_of(_ELEMENTS["NONE"])
+                codes[move.get_y(), move.get_x()] = code_of(_ELEMENTS["MEAT_CHOPPER"])
+
+        move = self._prev_move
+        me = self._me
+        on_bomb = current[me.get_y(), me.get_x()] == code_of(_ELEMENTS["BOMB_BOMBERMAN"])
+        acts_first = move.act() and move._moves[0] == ACT
+        new_me = me
+        if move.direction:
+            pnt = self.direction_to_point(move.direction)
+            if codes[pnt.get_y(), pnt.get_x()] in free:
+                new_me = pnt
+        if new_me == me:
+            if move.act():
+                on_bomb = True
+            codes[me.get_y(), me.get_x()] = code_of(_ELEMENTS["BOMB_BOMBERMAN" if on_bomb else "BOMBERMAN"])
+            return decode(codes.ravel())
+        if on_bomb or acts_first:
+            timer = min(BOMB_TIMEOUT, max(1, self._bomb._placed or BOMB_TIMEOUT))
+            codes[me.get_y(), me.get_x()] = code_of(_ELEMENTS["BOMB_TIMER_%d" % timer])
+        else:
+            codes[me.get_y(), me.get_x()] = code_of(_ELEMENTS["NONE"])
+        codes[new_me.get_y(), new_me.get_x()] = \
+            code_of(_ELEMENTS["BOMB_BOMBERMAN" if move.act() and not acts_first else "BOMBERMAN"])
+        return decode(codes.ravel())
+
+    def speculate(self):
+        """ Precompute the next tick in the idle time after the command is sent.
+
+        The predicted board goes through the per-tick pipeline on a copy of
+        the solver and the distance field of the predicted matrix is kept.
+        The next get() answers path queries from it as far as the actual
+        board allows, see ReusedField.
+
+        It runs in the gap before the next frame, expected one frame gap
+        after the last one. It is skipped when the last speculation would
+        not fit in the time left and dropped when it overruns it.
+        """
+        self._speculation = None
+        if not self.speculative or self._board is None or not self._me:
+            return
+        started = perf_counter()
+        next_at = None
+        if self._frame_gap is not None:
+            next_at = self._arrived_at + self._frame_gap
+            if started + self._speculation_time > next_at:
+                # a slow one does not rule out the next ticks for good
+                self._speculation_time /= 2
+                return
+        board_string = self._predict_board()
+        if board_string is None:
+            return
+        # the updates rebind their attributes, only the perk counters mutate
+        spec = copy.copy(self)
+        spec.choppers = copy.copy(self.choppers)
+        spec.choppers.tracker = copy.copy(self.choppers.tracker)
+        spec._bomb = copy.copy(self._bomb)
+        spec._perks_info = copy.copy(self._perks_info)
+        spec._perks_info.current_perks = copy.copy(self._perks_info.current_perks)
+        spec.profiler = TickProfiler()
+        # the real tick logs the same things
+        spec.quiet = True
+        spec._skipped = 0
+        spec._prepare(board_string)
+        if next_at is not None and perf_counter() > next_at:
+            self._speculation_time = perf_counter() - started
+            return
+        self._speculation = (spec._me, spec._matrix, DistanceField(spec._matrix, spec._me))
+        self._speculation_time = perf_counter() - started
+
+    def _reuse_speculation(self):
+        me, matrix, field = self._speculation
+        self._speculation = None
+        if me != self._me or matrix.shape != self._matrix.shape:
+            self.profiler.count("speculation_rejected")
+            return
+        changed = np.flatnonzero(matrix != self._matrix)
+        self._field = ReusedField(field, changed, self._build_field)
+
+    def get_deco(f):
+        def wrapper(self, board_string, arrived_at = None, skipped = 0):
+            """ arrived_at is the perf_counter() time the frame arrived at.
+
+            skipped is the number of boards dropped unanswered since the
+            last call. Bomb timers and perk durations count them down, the
+            chopper tracks and the speculation start over.
+            """
+            prof = self.profiler
+            prof.start_tick()
+            if arrived_at is None:
+                arrived_at = perf_counter()
+            if self._arrived_at is not None:
+                self._frame_gap = arrived_at - self._arrived_at
+            self._arrived_at = arrived_at
+            self._skipped = skipped
+            if skipped:
+                self._speculation = None
+            self._tick_deadline = None
+            if self.deadline is not None:
+                self._tick_deadline = arrived_at + self.deadline
+            self._count +=1
+            logger.info(f"{10*'-'} tick: {self._count}")
+            self._prepare(board_string)
+            if self._speculation:
+                with prof.phase("speculation"):
+                    self._reuse_speculation()
+            with prof.phase("logging"):
+                logger.info("%s", LazyStr(self._board.to_string))
+                logger.debug("Bomb info: %s", self._bomb)
             res = NextMoves()
+            if self._tick_deadline is not None:
+                prof.add_time("budget", self._tick_deadline - perf_counter())
+                prof.count("deadline_hits", 0)
+                with prof.phase("fallback"):
+                    self._offer(self._safe_fallback())
             try:
-                res = f(self, board_string)
+                with prof.phase("decide"):
+                    res = f(self, board_string)
+            except DeadlineExceeded:
+                res = self._best_moves
+                prof.count("deadline_hits")
+                logger.info(f"Deadline hit, best decision so far: {res}")
             except Exception as e:
                 exc_info = traceback.format_exc()
                 logger.error(f"Unexpected exception occured: {exc_info}")
             self._prev_bombermans = self._other_players
             self._prev_players_num = len(self._other_players)
             self._prev_perks = self._perks
-            logger.info(f"send command: --->{res}<--- decision time: {time.time() - start_time} seconds")
+            if isinstance(self._field, ReusedField):
+                prof.count("speculation_hits", self._field.hits)
+                prof.count("speculation_misses", self._field.misses)
+            decision_time = prof.end_tick()
+            logger.info(f"send command: --->{res}<--- decision time: {decision_time} seconds")
             self._prev_move = res
             return str(res)
         return wrapper
@@ -593,9 +837,13 @@ class DirectionSolver:
 
     def calculate_next_path(self):
         if self._mode.mode in DESTROY_MODES:
-            target_path = self.get_path(self._mode.target)
+            with self.profiler.phase("path_search"):
+                target_path = self._planner.plan(self._matrix, self._me, self._mode.target)
+            self.profiler.count("path_searches")
+            logger.debug("Planner expanded %s cells, %s changed",
+                         self._planner.expanded, self._planner.updated)
             return target_path
-        return None
+        return self.get_path(self._mode.target)
 
     def pick_mode(self):
         logger.info("Picking new mode")
@@ -616,6 +864,7 @@ class DirectionSolver:
             logger.info("ROAM")
             roaming_points = self.get_roaming_point()
             for roam_point in roaming_points:
+                self._check_deadline()
                 roam_path = self.get_path(roam_point)
                 if not roam_path:
                     continue
@@ -623,17 +872,33 @@ class DirectionSolver:
                 return ModeInfo(Mode.ROAMING, target_pnt), roam_path
         return None, None
 
-    def panic_path(self):
-        safe_places = self.get_safe_place()
-        logger.info(f"safe places: {safe_places}")
-        safe_path_list = self.get_good_place(safe_places)
-        logger.info(f"get {len(safe_path_list)} safe pathes")
-        for sp in safe_path_list:
-            if len(sp) > 1:
-                next_point = Point(*sp[1])
-                if not self.is_place_safe(next_point) and self.is_place_safe():
-                    continue
-                return sp
+    def panic_path(self, bomb_at_me = False):
+        """ Shortest path that is safe on every tick, None if we should stay."""
+        blasts = self._blasts
+        passable = ~self._board.get_mask(NOT_PASSIBLE)
+        if bomb_at_me:
+            bombs = self._bomb.get_bomb(self)
+            bombs[self._me] = (BOMB_TIMEOUT - 1, self.config.blast_range + self._perks_info.get_range())
+            blasts = BlastMap(self._board, bombs, self.config.blast_range)
+            passable[self._me.get_y(), self._me.get_x()] = False
+        immune = self._perks_info.get(Perk.IMMUNE)
+        mad = self._board.points_mask(self.choppers.mad_choppers)
+
+        def danger(t):
+            hit = blasts.ticks == t if t >= immune else False
+            return hit | mad | self.choppers.danger_mask(t)
+
+        def safe(t):
+            ticks = blasts.ticks
+            return ((ticks == BlastMap.NEVER) | (ticks < max(t, immune))) & ~self.choppers.danger_mask(t)
+
+        planner = EscapePlanner(self._board.get_bitboard(), passable, ESCAPE_HORIZON)
+        with self.profiler.phase("path_search"):
+            path = planner.find_path(self._me, danger, safe)
+        self.profiler.count("path_searches")
+        logger.info(f"escape path: {path}, {planner.expanded} states")
+        if len(path) > 1 and path[1] != path[0]:
+            return path
         return None
 
     def start_panic(self):
@@ -644,7 +909,7 @@ class DirectionSolver:
             self._panics = 0
             return NextMoves(ACT)
         panic_path = self.panic_path()
-        logger.debug(f"Panic path: {panic_path}")
+        logger.debug("Panic path: %s", panic_path)
         if panic_path:
             next_p = Point(*panic_path[1])
             return NextMoves(self.get_direction(self._me,next_p))
@@ -659,12 +924,12 @@ class DirectionSolver:
             path_is_straight = self.check_path_straight(new_path)
             place_bomb = self._mode.mode in DESTROY_MODES and \
                          path_is_straight and \
-                         len(new_path) - 1 <= BLAST_RANGE + self._perks_info.get_range()
+                         len(new_path) - 1 <= self.config.blast_range + self._perks_info.get_range()
             if len(new_path) == 2 or place_bomb:
                 prev_mode = self._mode.mode
                 self._mode = None
                 if prev_mode in DESTROY_MODES:
-                    panic_path = self.panic_path()
+                    panic_path = self.panic_path(bomb_at_me = True)
                     dr = "NONE"
                     if panic_path:
                         next_point = Point(*panic_path[1])
@@ -672,7 +937,7 @@ class DirectionSolver:
                     return NextMoves(ACT, dr)
                 else:
                     return NextMoves(dr)
-            SAFE_MOVES = 5
+            SAFE_MOVES = self.config.safe_moves
 
             if len(new_path) <= SAFE_MOVES and self._perks_info.get(Perk.IMMUNE) <= SAFE_MOVES:
                 return NextMoves(dr)
@@ -683,7 +948,8 @@ class DirectionSolver:
             if self._bomb.placed():
                 return NextMoves(dr)
 
-
+            self._offer(NextMoves(dr))
+            self._check_deadline()
             current_points = self.get_potential_yield(self._me)
             next_points = self.get_potential_yield(next_point)
             logger.info(f"yields: {current_points}   {next_points}")
@@ -694,25 +960,15 @@ class DirectionSolver:
             else:
                 return NextMoves(dr)
 
-    @get_deco
-    def get(self, board_string):
-
-        if self._board.get_at(*self._me.get()).get_char() == _ELEMENTS["DEAD_BOMBERMAN"] or \
-           not self._destroy_walls:
-            logger.info("game over")
-            self._prev_players_num = 0
-            self._bomb.reset()
-            self._perks_info.reset()
-            self._victim = None
-            self._panics = 0
-            return NextMoves()
-
+    def select_mode(self):
+        """ Keeps or changes the current mode, returns the path to follow."""
         new_path = None
 
         if not self._mode:
            self._mode, new_path  = self.pick_mode()
         elif self._mode.mode != Mode.PANIC:
             perks_path = self.get_near_perk_path()
+            self._check_deadline()
             if perks_path:
                 logger.info("PERK HUNT!!")
                 target_pnt = Point(*perks_path[-1])
@@ -720,6 +976,7 @@ class DirectionSolver:
                 self._mode = ModeInfo(Mode.PERK_HUNT,target_pnt)
             else:
                 kill_path = self.get_kill_path()
+                self._check_deadline()
                 if self._mode.mode == Mode.ROAMING and kill_path:
                     logger.info("KILL!!")
                     target_pnt = Point(*kill_path[-1])
@@ -727,14 +984,35 @@ class DirectionSolver:
                     self._mode = ModeInfo(Mode.KILL,target_pnt)
                     new_path = kill_path
                 else:
-                    new_path = self.get_path(self._mode.target)
+                    new_path = self.calculate_next_path()
                     target_obj = self._board.get(self._mode.target).get_char()
                     if not new_path or target_obj not in [_ELEMENTS["OTHER_BOMBERMAN"], _ELEMENTS["DESTROY_WALL"] ]:
                         logger.info("Time to pick new mode")
                         self._mode, new_path  = self.pick_mode()
                         logger.info(f"new mode is {self._mode}")
+        return new_path
+
+    @get_deco
+    def get(self, board_string):
+
+        if self._board.get_at(*self._me.get()) == Element("DEAD_BOMBERMAN") or \
+           not self._destroy_walls:
+            logger.info("game over")
+            self._prev_players_num = 0
+            self._bomb.reset()
+            self._perks_info.reset()
+            self._planner.reset()
+            self._victim = None
+            self._panics = 0
+            return NextMoves()
+
+        with self.profiler.phase("mode"):
+            new_path = self.select_mode()
 
         logger.info(f"Current mode is {self._mode}, {new_path}")
+        if new_path and len(new_path) > 1 and self.is_place_safe(Point(*new_path[1])):
+            self._offer(NextMoves(self.get_direction(self._me, Point(*new_path[1]))))
+        self._check_deadline()
 
         
         if not self._mode or \
@@ -745,7 +1023,7 @@ class DirectionSolver:
             self._panics = 0
 
         next_move = self.get_next_mode_moves(new_path)
-        logger.debug(f"Next moves returned: {next_move}")
+        logger.debug("Next moves returned: %s", next_move)
         next_point = self.direction_to_point(next_move.direction)
         is_immune = self._perks_info.get(Perk.IMMUNE)
 
@@ -759,7 +1037,7 @@ class DirectionSolver:
                 next_move.do_act(after_move = True)
             elif self._me not in self._bomb.danger:
                 next_move.do_act(after_move = False)
-        logger.debug(f"Next moves with rc: {next_move}")
+        logger.debug("Next moves with rc: %s", next_move)
 
         if self.is_place_safe(next_point):
             return next_move
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+
+###
+# #%L
+# Codenjoy - it's a dojo-like platform from developers to developers.
+# %%
+# Copyright (C) 2018 Codenjoy
+# %%
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public
+# License along with this program.  If not, see
+# <http://www.gnu.org/licenses/gpl-3.0.html>.
+# #L%
+###
+
+from heapq import heappush, heappop
+import numpy as np
+
+INF = float('inf')
+
+
+class DistanceField:
+    """ Weighted distances from one start cell to every cell of a cost matrix.
+
+    The matrix is indexed as [y][x], a cell cost of 0 or less means the cell
+    is not walkable, entering a walkable cell costs its value. Like the
+    pathfinding finders the start cell is always walkable and a blocked
+    target can be reached from its walkable neighbours.
+    """
+    def __init__(self, matrix, start):
+        rows = matrix.tolist() if hasattr(matrix, 'tolist') else matrix
+        self._height = len(rows)
+        self._width = len(rows[0]) if rows else 0
+        self._cost = [c for row in rows for c in row]
+        self._start = self._index(*start.get())
+        self._dist = [INF] * len(self._cost)
+        self._parent = [-1] * len(self._cost)
+        self.runs = 0
+        self._search()
+
+    def _index(self, x, y):
+        return y * self._width + x
+
+    def _inside(self, x, y):
+        return 0 <= x < self._width and 0 <= y < self._height
+
+    def _neighbours(self, i):
+        w = self._width
+        x = i % w
+        if x > 0:
+            yield i - 1
+        if x < w - 1:
+            yield i + 1
+        if i >= w:
+            yield i - w
+        if i + w < len(self._cost):
+            yield i + w
+
+    def _search(self):
+        cost, dist, parent = self._cost, self._dist, self._parent
+        dist[self._start] = 0
+        heap = [(0, self._start)]
+        while heap:
+            d, i = heappop(heap)
+            if d > dist[i]:
+                continue
+            self.runs += 1
+            for j in self._neighbours(i):
+                c = cost[j]
+                if c <= 0:
+                    continue
+                nd = d + c
+                if nd < dist[j]:
+                    dist[j] = nd
+                    parent[j] = i
+                    heappush(heap, (nd, j))
+
+    def _entry(self, pnt):
+        """ Returns (distance, parent index) of the cell, blocked cells included."""
+        x, y = pnt.get()
+        if not self._inside(x, y):
+            return INF, -1
+        i = self._index(x, y)
+        if i == self._start or self._cost[i] > 0:
+            return self._dist[i], self._parent[i]
+        return min(((self._dist[j], j) for j in self._neighbours(i)), default=(INF, -1))
+
+    def distance(self, pnt):
+        """ Return the path cost to the point, INF if it is not reachable."""
+        return self._entry(pnt)[0]
+
+    def get_path(self, pnt):
+        """ Return the list of (x, y) from the start to the point.
+
+        The list is empty if the point is not reachable.
+        """
+        dist, i = self._entry(pnt)
+        if dist == INF:
+            return []
+        path = [pnt.get()]
+        while i != -1:
+            path.append((i % self._width, i // self._width))
+            i = self._parent[i]
+        path.reverse()
+        return path
+
+    def as_array(self):
+        """ Return the distances as a [y, x] array, inf where not reachable.
+
+        Blocked cells are inf even when a path ends next to them.
+        """
+        return np.array(self._dist).reshape(self._height, self._width)
+
+    def radius_without(self, changed):
+        """ Return the distance below which no path can reach a changed cell.
+
+        changed are flat [y * width + x] indexes of cells whose cost may
+        differ, distances below the radius stay exact whatever they cost.
+        """
+        radius = INF
+        for i in changed:
+            if i == self._start:
+                continue
+            nearest = min((self._dist[j] for j in self._neighbours(i)), default=INF)
+            radius = min(radius, nearest + 1)
+        return radius
+
+
+class ReusedField:
+    """ A DistanceField of a predicted matrix answering for the actual one.
+
+    Queries closer than the radius of the changed cells are exact and are
+    answered from the prediction, the first other query builds the field of
+    the actual matrix with make_field and it answers from then on.
+    """
+    def __init__(self, field, changed, make_field):
+        self._field = field
+        self._changed = set(changed)
+        self._make_field = make_field
+        self._actual = None
+        self.radius = field.radius_without(self._changed)
+        self.hits = 0
+        self.misses = 0
+
+    def _field_for(self, pnt):
+        if self._actual is None:
+            field = self._field
+            x, y = pnt.get()
+            # with an infinite radius the changes are out of reach entirely
+            if (field._inside(x, y) and field._index(x, y) not in self._changed
+                    and (field.distance(pnt) < self.radius or self.radius == INF)):
+                self.hits += 1
+                return field
+            self.misses += 1
+            self._actual = self._make_field()
+        return self._actual
+
+    def distance(self, pnt):
+        return self._field_for(pnt).distance(pnt)
+
+    def get_path(self, pnt):
+        return self._field_for(pnt).get_path(pnt)
+
+    def as_array(self):
+        # exact everywhere only if no change is in reach
+        if self._actual is None and self.radius != INF:
+            self.misses += 1
+            self._actual = self._make_field()
+        return (self._actual or self._field).as_array()
+
+
+if __name__ == '__main__':
+    raise RuntimeError("This module is not designed to be ran from CLI")
@@ -22,8 +22,6 @@
 # #L%
 ###
 
-from argparse import ArgumentError
-
 _ELEMENTS = dict(
     # The Bomberman
     BOMBERMAN = b'\xe2\x98\xba'.decode(),  # encoded '☺' char
@@ -56,35 +54,70 @@ _ELEMENTS = dict(
     NONE = ' '
 )
 
+# Small integer codes of the elements in declaration order,
+# used by the array representation of the board.
+_CODES = {c: i for i, c in enumerate(_ELEMENTS.values())}
+
+
+def code_of(char):
+    """ Return the small integer code of the given element char."""
+    try:
+        return _CODES[char]
+    except KeyError:
+        raise KeyError("No such Element: {}".format(char)) from None
+
 
 def value_of(char):
     """ Test whether the char is valid Element and return it's name."""
-    for value, c in _ELEMENTS.items():
-        if char == c:
-            return value
-    else:
-        raise ArgumentError("No such Element: {}".format(char))
+    try:
+        return _BY_CHAR[char]._name
+    except KeyError:
+        raise KeyError("No such Element: {}".format(char)) from None
 
 
 class Element:
-    """ Class describes the Element objects for Bomberman game."""
-    def __init__(self, n_or_c):
-        """ Construct an Element object from given name or char."""
-        for n, c in _ELEMENTS.items():
-            if n_or_c == n or n_or_c == c:
-                self._name = n
-                self._char = c
-                break
-        else:
-            raise ArgumentError("No such Element: {}".format(n_or_c))
-            
+    """ Class describes the Element objects for Bomberman game.
+
+    Elements are flyweights: there is exactly one instance per element,
+    constructing one is a dict lookup.
+    """
+    __slots__ = ('_name', '_char', '_code')
+
+    def __new__(cls, n_or_c):
+        """ Return the Element object for given name or char."""
+        try:
+            return _BY_NAME.get(n_or_c) or _BY_CHAR[n_or_c]
+        except (KeyError, TypeError):
+            raise KeyError("No such Element: {}".format(n_or_c)) from None
+
+    @classmethod
+    def _create(cls, name, char):
+        element = object.__new__(cls)
+        element._name = name
+        element._char = char
+        element._code = _CODES[char]
+        return element
+
     def get_char(self):
         """ Return the Element's character."""
         return self._char
+
+    def get_code(self):
+        """ Return the Element's small integer code."""
+        return self._code
     
     def __eq__(self, otherElement):
-        return (self._name == otherElement._name and
-                self._char == otherElement._char)
+        return self._code == otherElement._code
+
+    def __hash__(self):
+        return self._code
+
+    def __repr__(self):
+        return self._name
+
+
+_BY_NAME = {n: Element._create(n, c) for n, c in _ELEMENTS.items()}
+_BY_CHAR = {e._char: e for e in _BY_NAME.values()}
 
 
 if __name__ == '__main__':
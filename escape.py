@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+###
+# #%L
+# Codenjoy - it's a dojo-like platform from developers to developers.
+# %%
+# Copyright (C) 2018 Codenjoy
+# %%
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public
+# License along with this program.  If not, see
+# <http://www.gnu.org/licenses/gpl-3.0.html>.
+# #L%
+###
+
+from bitboard import from_mask
+
+
+class EscapePlanner:
+    """ Breadth first search over (x, y, tick) states, a tick at a time.
+
+    Tick t is the position after t moves, staying in place is a move too.
+    The states of a tick are one bitset, the next tick is the flood of it
+    one step further: frontier[t + 1] = (frontier[t] | neighbours & passable)
+    & ~danger(t + 1). The search stops at the first tick with a state where
+    safe(t) says we can stay forever.
+    """
+    def __init__(self, bits, passable, horizon):
+        """ bits is the BitBoard of the board, passable is a boolean [y, x]
+        array of cells we can step on.
+        """
+        self._bits = bits
+        self._passable = from_mask(passable)
+        self._horizon = horizon
+        self.expanded = 0
+
+    def find_path(self, start, danger, safe):
+        """ Return the shortest list of (x, y) leading to a safe state.
+
+        danger(t) and safe(t) return boolean [y, x] arrays of the cells
+        which are dead and safe at tick t. If no state is safe within the
+        horizon, the path surviving the longest is returned.
+        """
+        bits = self._bits
+        frontier = [bits.bit(start)]
+        target = None
+        while True:
+            t = len(frontier) - 1
+            reached = frontier[t]
+            safe_now = reached & from_mask(safe(t))
+            if safe_now:
+                target = safe_now
+                break
+            if t == self._horizon:
+                break
+            reached = (reached | bits.neighbours(reached) & self._passable) & ~from_mask(danger(t + 1))
+            if not reached:
+                break
+            frontier.append(reached)
+        self.expanded = sum(bin(layer).count("1") for layer in frontier)
+        return self._backtrack(frontier, target or frontier[-1])
+
+    def _backtrack(self, frontier, targets):
+        """ Walk back from the lowest target cell through the frontiers,
+        stepping in from a neighbour when one was reached, else staying.
+        """
+        bits = self._bits
+        cell = targets & -targets
+        path = [cell]
+        for reached in reversed(frontier[:-1]):
+            came_from = bits.neighbours(cell) & reached if cell & self._passable else 0
+            if came_from:
+                cell = came_from & -came_from
+            path.append(cell)
+        return [pnt.get() for bit in reversed(path) for pnt in bits.points(bit)]
+
+
+if __name__ == '__main__':
+    raise RuntimeError("This module is not designed to be ran from CLI")
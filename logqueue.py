@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+
+###
+# #%L
+# Codenjoy - it's a dojo-like platform from developers to developers.
+# %%
+# Copyright (C) 2018 Codenjoy
+# %%
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public
+# License along with this program.  If not, see
+# <http://www.gnu.org/licenses/gpl-3.0.html>.
+# #L%
+###
+
+import atexit
+import copy
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+
+class LazyStr:
+    """ Log argument which calls func to build its text only when formatted.
+
+    func must only read state which does not change afterwards, as it may
+    be called later from the log writer thread.
+    """
+    __slots__ = ('_func',)
+
+    def __init__(self, func):
+        self._func = func
+
+    def __str__(self):
+        return self._func()
+
+
+_IMMUTABLE = (str, bytes, int, float, complex, bool, type(None), LazyStr)
+
+
+def _is_immutable(arg):
+    if isinstance(arg, (tuple, frozenset)):
+        return all(_is_immutable(item) for item in arg)
+    return isinstance(arg, _IMMUTABLE)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """ Puts records to a bounded queue without ever blocking.
+
+    When the queue is full records below `keep_level` are dropped, more
+    important ones push out the oldest queued record.
+    """
+    def __init__(self, queue, keep_level=logging.WARNING):
+        super().__init__(queue)
+        self.keep_level = keep_level
+        self.dropped = 0
+
+    def prepare(self, record):
+        """ Queue the record with its arguments, the writer thread formats it.
+
+        Only arguments which can not change afterwards are left to the
+        writer thread, a record with any other one is formatted here.
+        """
+        record = copy.copy(record)
+        if record.args and not _is_immutable(record.args):
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            if record.levelno < self.keep_level:
+                return
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                self.queue.put_nowait(record)
+            except queue.Full:
+                pass
+
+
+def start_queue_logging(logger, handlers, maxsize=10000):
+    """ Route the logger records through a queue to a writer thread.
+
+    The handlers are called by the writer thread, their levels are
+    respected. Returns the queue handler, its `dropped` counts the
+    records lost to overload.
+    """
+    handler = DroppingQueueHandler(queue.Queue(maxsize))
+    listener = QueueListener(handler.queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    logger.addHandler(handler)
+    return handler
+
+
+if __name__ == '__main__':
+    raise RuntimeError("This module is not designed to be ran from CLI")
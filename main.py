@@ -23,15 +23,24 @@
 ###
 
 
+from time import perf_counter
+STARTED = perf_counter()
+
+import signal
+from concurrent.futures import ThreadPoolExecutor
 from sys import version_info, argv
 from webclient import WebClient
-from dds import DirectionSolver
 from urllib.parse import urlparse, parse_qs
 
 
 URL_TEST = "http://ec2-3-250-31-170.eu-west-1.compute.amazonaws.com:7777/codenjoy-contest/board/player/asdasdasdasd?code=1212121212"
 URL_GAME = "https://botchallenge.cloud.epam.com/codenjoy-contest/board/player/ors0qf4yh5xk95zi9l0k?code=8267609647777868624"
 
+PROFILE_FILE = "profile.json"
+RECORD_FILE = "games.rec"
+# seconds from the board arrival to answer within, the server ticks once a second
+DECISION_BUDGET = 0.5
+
 
 def get_url_for_ws(url):
     parsed_url = urlparse(url)
@@ -43,14 +52,46 @@ def get_url_for_ws(url):
                                                                 query['code'][0])
 
 
+def make_solver(startup):
+    """ Import and build the solver, runs while the connection is made."""
+    from dds import DirectionSolver
+    startup["solver_imported"] = perf_counter()
+    direction_solver = DirectionSolver(deadline=DECISION_BUDGET, speculative=True)
+    direction_solver.profiler.dump_at_exit(PROFILE_FILE)
+    startup["solver_ready"] = perf_counter()
+    return direction_solver
+
+
+def make_recorder():
+    from recorder import GameRecorder
+    return GameRecorder(RECORD_FILE)
+
+
 def main():
     assert version_info[0] == 3, "You should run me with Python 3.x"
 
-    url = URL_TEST if len(argv) > 1 and argv[1] == "test" else URL_GAME
-    direction_solver = DirectionSolver()
+    startup = {"start": STARTED, "client_imported": perf_counter()}
+    url = URL_TEST if "test" in argv[1:] else URL_GAME
+    client = WebClient
+    if "async" in argv[1:]:
+        # answers the newest board when boards arrive faster than we decide
+        from aioclient import AsyncWebClient as client
+
+    pool = ThreadPoolExecutor(max_workers=1)
+    direction_solver = pool.submit(make_solver, startup)
+    recorder = pool.submit(make_recorder)
+    # signal handlers can only be set from the main thread
+    signal.signal(signal.SIGUSR1, lambda *args: direction_solver.done() and
+                  direction_solver.result().profiler.dump(PROFILE_FILE))
 
-    wcl = WebClient(url=get_url_for_ws(url), solver=direction_solver)
-    wcl.run_forever()
+    wcl = client(url=get_url_for_ws(url), solver=direction_solver, recorder=recorder,
+                 startup=startup)
+    try:
+        wcl.run_forever()
+    finally:
+        recorder.result().close()
+        if isinstance(wcl, WebClient):
+            print("Reconnects: {}".format(wcl.reconnect_stats()))
 
 
 if __name__ == '__main__':
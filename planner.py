@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+
+###
+# #%L
+# Codenjoy - it's a dojo-like platform from developers to developers.
+# %%
+# Copyright (C) 2018 Codenjoy
+# %%
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public
+# License along with this program.  If not, see
+# <http://www.gnu.org/licenses/gpl-3.0.html>.
+# #L%
+###
+
+from heapq import heappush, heappop
+import numpy as np
+
+INF = float('inf')
+
+
+class IncrementalPlanner:
+    """ D* Lite path planner to a fixed target over a changing cost matrix.
+
+    The search runs backwards from the target and keeps its state between
+    ticks, so when only a few cells change cost, or we move along the
+    path, only the affected part of the search is repaired. A new target
+    or board size starts a fresh search.
+
+    Costs follow DistanceField: entering a cell costs its value, cells
+    with 0 or less are not walkable, except the target which can always
+    be entered.
+    """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._goal = None
+        self._matrix = None
+        self.expanded = 0
+        self.updated = 0
+
+    def _index(self, x, y):
+        return y * self._width + x
+
+    def _h(self, a, b):
+        w = self._width
+        return abs(a % w - b % w) + abs(a // w - b // w)
+
+    def _neighbours(self, i):
+        w = self._width
+        x = i % w
+        if x > 0:
+            yield i - 1
+        if x < w - 1:
+            yield i + 1
+        if i >= w:
+            yield i - w
+        if i + w < self._len:
+            yield i + w
+
+    def _enter(self, i):
+        c = self._cost[i]
+        if c > 0:
+            return c
+        return 0 if i == self._goal else INF
+
+    def _key(self, i):
+        m = min(self._g[i], self._rhs[i])
+        return (m + self._h(self._start, i) + self._km, m)
+
+    def _push(self, i):
+        key = self._key(i)
+        self._queued[i] = key
+        heappush(self._heap, (key, i))
+
+    def _update_vertex(self, i):
+        if i != self._goal:
+            best = INF
+            for j in self._neighbours(i):
+                c = self._enter(j) + self._g[j]
+                if c < best:
+                    best = c
+            self._rhs[i] = best
+        if self._g[i] != self._rhs[i]:
+            self._push(i)
+        else:
+            self._queued.pop(i, None)
+
+    def _top_key(self):
+        while self._heap:
+            key, i = self._heap[0]
+            if self._queued.get(i) == key:
+                return key
+            heappop(self._heap)
+        return (INF, INF)
+
+    def _compute(self):
+        g, rhs = self._g, self._rhs
+        while self._top_key() < self._key(self._start) or rhs[self._start] != g[self._start]:
+            if not self._heap:
+                break
+            k_old, u = heappop(self._heap)
+            del self._queued[u]
+            self.expanded += 1
+            k_new = self._key(u)
+            if k_old < k_new:
+                self._push(u)
+            elif g[u] > rhs[u]:
+                g[u] = rhs[u]
+                for p in self._neighbours(u):
+                    self._update_vertex(p)
+            else:
+                g[u] = INF
+                self._update_vertex(u)
+                for p in self._neighbours(u):
+                    self._update_vertex(p)
+
+    def _init_search(self, matrix, start, goal):
+        self._height, self._width = matrix.shape
+        self._len = self._height * self._width
+        self._cost = matrix.ravel().tolist()
+        self._goal = goal
+        self._start = start
+        self._km = 0
+        self._g = [INF] * self._len
+        self._rhs = [INF] * self._len
+        self._rhs[goal] = 0
+        self._heap = []
+        self._queued = {}
+        self._push(goal)
+
+    def plan(self, matrix, start, goal):
+        """ Return the list of (x, y) from start to goal, empty if there is no path."""
+        matrix = np.asarray(matrix)
+        self.expanded = 0
+        self.updated = 0
+        restart = self._matrix is None or matrix.shape != self._matrix.shape or \
+                  self._index(*goal.get()) != self._goal
+        if restart:
+            self._width = matrix.shape[1]
+            self._init_search(matrix, self._index(*start.get()), self._index(*goal.get()))
+        else:
+            start_i = self._index(*start.get())
+            self._km += self._h(self._start, start_i)
+            self._start = start_i
+            changed = np.flatnonzero(matrix.ravel() != self._matrix.ravel()).tolist()
+            cost = matrix.ravel().tolist()
+            for i in changed:
+                self._cost[i] = cost[i]
+            # the cost of entering a cell changed, i.e. the edges from its neighbours
+            for i in changed:
+                for p in self._neighbours(i):
+                    self._update_vertex(p)
+            self.updated = len(changed)
+        self._matrix = matrix.copy()
+        self._compute()
+        return self._extract()
+
+    def _extract(self):
+        i = self._start
+        if self._g[i] == INF and self._rhs[i] == INF:
+            return []
+        w = self._width
+        path = [(i % w, i // w)]
+        for _ in range(self._len):
+            if i == self._goal:
+                return path
+            i = min(self._neighbours(i), key=lambda j: self._enter(j) + self._g[j])
+            if self._enter(i) + self._g[i] == INF:
+                return []
+            path.append((i % w, i // w))
+        return []
+
+
+if __name__ == '__main__':
+    raise RuntimeError("This module is not designed to be ran from CLI")
@@ -24,16 +24,21 @@
 
 
 class Point:
-    """ Describes a point on board."""
+    """ Describes a point on board.
+
+    Points are treated as immutable, the hash is computed once. A point
+    does not know the board size and may lie off the board, so it keeps
+    x and y, PointGrid gives the flat cell index.
+    """
+    __slots__ = ('_x', '_y', '_hash')
+
     def __init__(self, x=0, y=0):
         self._x = int(x)
         self._y = int(y)
+        self._hash = hash((self._x, self._y))
 
     def get(self):
         return self._x, self._y
-    
-    def __key(self):
-        return self._x, self._y
 
     def __str__(self):
         return self.to_string()
@@ -42,7 +47,9 @@ class Point:
         return self.to_string()
 
     def __eq__(self, other_point):
-        return self.__key() == other_point.__key()
+        if not isinstance(other_point, Point):
+            return NotImplemented
+        return self._x == other_point._x and self._y == other_point._y
 
     def __sub__(self, other_point):
         return self._x - other_point._x, self._y - other_point._y
@@ -53,14 +60,13 @@ class Point:
         return Point(self._x + other_point._x, self._y + other_point._y)
 
     def distance(self, other):
-        dx, dy = self - other
-        return abs(dx) + abs(dy)
+        return abs(self._x - other._x) + abs(self._y - other._y)
 
     def surrounding_pnts(self):
         return [Point(self._x + dx, self._y + dy) for  dx, dy in [(0,1), (0,-1), (-1,0), (1,0)]]
 
     def __hash__(self):
-        return 1000 * self._x + self._y
+        return self._hash
 
     def get_x(self):
         return self._x
@@ -76,5 +82,44 @@ class Point:
         return "[{},{}]".format(self._x, self._y)
 
 
+class PointGrid:
+    """ Pre-built points and neighbour lists for a board of the given size.
+
+    Cells are addressed by index y * size + x. Grids are cached per size,
+    so the points are shared between the boards of a game.
+    """
+    _cache = {}
+
+    @classmethod
+    def for_size(cls, size):
+        grid = cls._cache.get(size)
+        if grid is None:
+            grid = cls._cache[size] = cls(size)
+        return grid
+
+    def __init__(self, size):
+        self._size = size
+        self._points = [Point(i % size, i // size) for i in range(size * size)]
+        self._neighbours = [[self._points[ny * size + nx]
+                             for nx, ny in ((x, y + 1), (x, y - 1), (x - 1, y), (x + 1, y))
+                             if 0 <= nx < size and 0 <= ny < size]
+                            for y in range(size) for x in range(size)]
+
+    def index(self, pnt):
+        return pnt._y * self._size + pnt._x
+
+    def at(self, index):
+        """ Return the point of the cell index."""
+        return self._points[index]
+
+    def get(self, x, y):
+        """ Return the shared point for x,y, which must be on the board."""
+        return self._points[y * self._size + x]
+
+    def neighbours(self, pnt):
+        """ Return the points around pnt which are on the board."""
+        return self._neighbours[pnt._y * self._size + pnt._x]
+
+
 if __name__ == '__main__':
     raise RuntimeError("This module is not expected to be ran from CLI")
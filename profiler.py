@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+###
+# #%L
+# Codenjoy - it's a dojo-like platform from developers to developers.
+# %%
+# Copyright (C) 2018 Codenjoy
+# %%
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public
+# License along with this program.  If not, see
+# <http://www.gnu.org/licenses/gpl-3.0.html>.
+# #L%
+###
+
+import atexit
+import json
+import math
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from time import perf_counter
+
+
+def percentile(values, pct):
+    """ Nearest-rank percentile of a sorted list."""
+    if not values:
+        return 0
+    rank = max(0, min(len(values) - 1, math.ceil(pct / 100 * len(values)) - 1))
+    return values[rank]
+
+
+class TickProfiler:
+    """ Per-phase timings and counters of the solver ticks.
+
+    Phase times and counters are summed within a tick, when the tick ends
+    they go to rolling windows of the last `window` ticks.
+    """
+    def __init__(self, window=1000):
+        self._window = window
+        self.reset()
+
+    def reset(self):
+        self._timings = defaultdict(lambda: deque(maxlen=self._window))
+        self._counters = defaultdict(lambda: deque(maxlen=self._window))
+        self._tick_timings = defaultdict(float)
+        self._tick_counters = defaultdict(int)
+        self._tick_start = None
+        self.ticks = 0
+
+    def start_tick(self):
+        self._tick_timings.clear()
+        self._tick_counters.clear()
+        self._tick_start = perf_counter()
+
+    def end_tick(self):
+        """ Close the tick and return its total time in seconds."""
+        total = perf_counter() - self._tick_start
+        self._tick_timings["total"] = total
+        for name, value in self._tick_timings.items():
+            self._timings[name].append(value)
+        for name in set(self._counters) | set(self._tick_counters):
+            self._counters[name].append(self._tick_counters.get(name, 0))
+        self.ticks += 1
+        return total
+
+    @contextmanager
+    def phase(self, name):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self._tick_timings[name] += perf_counter() - start
+
+    def add_time(self, name, seconds):
+        self._tick_timings[name] += seconds
+
+    def count(self, name, n=1):
+        self._tick_counters[name] += n
+
+    def get_counts(self, name):
+        """ Return the per-tick values of the counter in the window."""
+        return list(self._counters.get(name, ()))
+
+    def get_tick_count(self, name):
+        """ Return the counter value of the current tick, or of the last one between ticks."""
+        return self._tick_counters.get(name, 0)
+
+    @staticmethod
+    def _summary(values):
+        values = sorted(values)
+        return {
+            "ticks": len(values),
+            "mean": sum(values) / len(values) if values else 0,
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+            "max": values[-1] if values else 0,
+        }
+
+    def stats(self):
+        """ Return {"timings": {phase: summary}, "counters": {name: summary}}.
+
+        Timings are in seconds.
+        """
+        return {
+            "ticks": self.ticks,
+            "timings": {name: self._summary(v) for name, v in self._timings.items()},
+            "counters": {name: self._summary(v) for name, v in self._counters.items()},
+        }
+
+    def dump(self, path=None):
+        """ Return the stats as JSON, also written to path if given."""
+        text = json.dumps(self.stats(), indent=2, sort_keys=True)
+        if path:
+            with open(path, "w") as f:
+                f.write(text)
+        return text
+
+    def dump_at_exit(self, path):
+        atexit.register(self.dump, path)
+
+
+if __name__ == '__main__':
+    raise RuntimeError("This module is not designed to be ran from CLI")
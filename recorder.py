@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+
+###
+# #%L
+# Codenjoy - it's a dojo-like platform from developers to developers.
+# %%
+# Copyright (C) 2018 Codenjoy
+# %%
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public
+# License along with this program.  If not, see
+# <http://www.gnu.org/licenses/gpl-3.0.html>.
+# #L%
+###
+
+"""
+Binary game recordings.
+
+A recording is a data file and a sidecar index file. The data file starts
+with MAGIC and then holds one record per tick:
+
+    header  RECORD_HEADER: flags, game, tick, board size, timestamp,
+            decision time, command length, payload length
+    command utf-8 bytes
+    payload keyframe: one element code byte per cell,
+            delta: uint32 indexes of changed cells then their code bytes,
+            zlib compressed when the FLAG_ZLIB flag is set
+
+The index file holds one INDEX_ENTRY per tick: the record offset and the
+offset of the keyframe it is based on, so any tick is found without
+reading the data file from the start. The index is the list of the
+recorded ticks, data past its last record is what a crash left behind
+and is cut off when the recording is resumed.
+"""
+
+import mmap
+import os
+import struct
+import zlib
+from collections import namedtuple
+import numpy as np
+from board import encode, decode
+
+MAGIC = b'BMBREC01'
+RECORD_HEADER = struct.Struct('<BIIHdfHI')
+INDEX_ENTRY = struct.Struct('<QQ')
+
+FLAG_KEYFRAME = 1
+FLAG_ZLIB = 2
+
+TickRecord = namedtuple('TickRecord', 'game tick board command timestamp decision_time')
+
+
+class GameRecorder:
+    """ Appends ticks to a recording, delta-encoded against the previous tick."""
+    def __init__(self, path, compress=True, keyframe_every=100, flush_every=50):
+        self._compress = compress
+        self._keyframe_every = keyframe_every
+        self._flush_every = flush_every
+        self._repair(path)
+        self._data = open(path, 'ab')
+        self._index = open(path + '.idx', 'ab')
+        if self._data.tell() == 0:
+            self._data.write(MAGIC)
+        self._game = self._last_game(path)
+        self._tick = 0
+        self._prev = None
+        self._keyframe_offset = 0
+        self._since_keyframe = 0
+        self._pending = 0
+
+    @staticmethod
+    def _repair(path):
+        """ Cut the files back to the last indexed record which is whole.
+
+        The data and the index are flushed separately, a crash may leave
+        records the index does not list, half written ones or a partial
+        index entry.
+        """
+        if not os.path.exists(path):
+            return
+        index_path = path + '.idx'
+        data_size = os.path.getsize(path)
+        entries = os.path.getsize(index_path) // INDEX_ENTRY.size if os.path.exists(index_path) else 0
+        end = len(MAGIC) if data_size >= len(MAGIC) else 0
+        with open(path, 'rb') as data, open(index_path, 'ab+') as index:
+            while entries:
+                index.seek((entries - 1) * INDEX_ENTRY.size)
+                offset, _ = INDEX_ENTRY.unpack(index.read(INDEX_ENTRY.size))
+                data.seek(offset)
+                header = data.read(RECORD_HEADER.size)
+                if len(header) == RECORD_HEADER.size:
+                    header = RECORD_HEADER.unpack(header)
+                    record_end = offset + RECORD_HEADER.size + header[6] + header[7]
+                    if record_end <= data_size:
+                        end = record_end
+                        break
+                entries -= 1
+            index.truncate(entries * INDEX_ENTRY.size)
+        if data_size != end:
+            os.truncate(path, end)
+
+    @staticmethod
+    def _last_game(path):
+        if os.path.getsize(path + '.idx') < INDEX_ENTRY.size:
+            return 0
+        with open(path + '.idx', 'rb') as index:
+            index.seek(-INDEX_ENTRY.size, os.SEEK_END)
+            offset, _ = INDEX_ENTRY.unpack(index.read(INDEX_ENTRY.size))
+        with open(path, 'rb') as data:
+            data.seek(offset)
+            return RECORD_HEADER.unpack(data.read(RECORD_HEADER.size))[1] + 1
+
+    def new_game(self):
+        """ Start a new game, its first tick is stored as a keyframe."""
+        if self._tick:
+            self._game += 1
+        self._tick = 0
+        self._prev = None
+
+    def record(self, board_string, command, timestamp, decision_time):
+        codes = encode(board_string)
+        size = int(np.sqrt(len(codes)))
+        flags = 0
+        keyframe = self._prev is None or len(self._prev) != len(codes) or \
+                   self._since_keyframe >= self._keyframe_every
+        if not keyframe:
+            changed = np.flatnonzero(codes != self._prev).astype('<u4')
+            payload = changed.tobytes() + codes[changed].tobytes()
+            keyframe = len(payload) >= len(codes)
+        if keyframe:
+            flags |= FLAG_KEYFRAME
+            payload = codes.tobytes()
+        if self._compress:
+            flags |= FLAG_ZLIB
+            payload = zlib.compress(payload, 1)
+
+        offset = self._data.tell()
+        if keyframe:
+            self._keyframe_offset = offset
+            self._since_keyframe = 0
+        cmd = command.encode()
+        self._data.write(RECORD_HEADER.pack(flags, self._game, self._tick, size, timestamp,
+                                            decision_time, len(cmd), len(payload)))
+        self._data.write(cmd)
+        self._data.write(payload)
+        self._index.write(INDEX_ENTRY.pack(offset, self._keyframe_offset))
+
+        self._prev = codes
+        self._tick += 1
+        self._since_keyframe += 1
+        self._pending += 1
+        if self._pending >= self._flush_every:
+            self.flush()
+
+    def flush(self):
+        self._pending = 0
+        self._data.flush()
+        self._index.flush()
+
+    def close(self):
+        self.flush()
+        self._data.close()
+        self._index.close()
+
+
+class GameReader:
+    """ Random access to the ticks of a recording through memory maps."""
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._data[:len(MAGIC)] != MAGIC:
+            raise ValueError("Not a game recording: {}".format(path))
+        with open(path + '.idx', 'rb') as f:
+            if os.fstat(f.fileno()).st_size:
+                self._index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self._index = b''
+        self._len = len(self._index) // INDEX_ENTRY.size
+        # ticks indexed before their record was written are not there
+        while self._len and self._end(self._entry(self._len - 1)[0]) > len(self._data):
+            self._len -= 1
+
+    def __len__(self):
+        return self._len
+
+    def _entry(self, i):
+        """ Returns (record offset, keyframe offset) of the i-th tick."""
+        return INDEX_ENTRY.unpack_from(self._index, i * INDEX_ENTRY.size)
+
+    def _end(self, offset):
+        """ Return the offset past the record, the header must be there."""
+        if offset + RECORD_HEADER.size > len(self._data):
+            return offset + RECORD_HEADER.size
+        header = RECORD_HEADER.unpack_from(self._data, offset)
+        return offset + RECORD_HEADER.size + header[6] + header[7]
+
+    def _read(self, offset):
+        """ Returns (header, command, payload, next offset) of the record."""
+        header = RECORD_HEADER.unpack_from(self._data, offset)
+        cmd_start = offset + RECORD_HEADER.size
+        cmd_len, payload_len = header[6], header[7]
+        payload_start = cmd_start + cmd_len
+        payload = self._data[payload_start:payload_start + payload_len]
+        if header[0] & FLAG_ZLIB:
+            payload = zlib.decompress(payload)
+        command = self._data[cmd_start:payload_start].decode()
+        return header, command, payload, payload_start + payload_len
+
+    @staticmethod
+    def _apply(codes, header, payload):
+        """ Returns the codes of the record, given the codes of the previous one."""
+        if header[0] & FLAG_KEYFRAME:
+            return np.frombuffer(payload, dtype=np.uint8).copy()
+        n = len(payload) // 5
+        codes[np.frombuffer(payload, dtype='<u4', count=n)] = \
+            np.frombuffer(payload, dtype=np.uint8, offset=4 * n)
+        return codes
+
+    def _codes(self, offset, keyframe_offset):
+        codes = None
+        while True:
+            header, command, payload, next_offset = self._read(keyframe_offset)
+            codes = self._apply(codes, header, payload)
+            if keyframe_offset == offset:
+                return header, command, codes
+            keyframe_offset = next_offset
+
+    def get(self, i):
+        """ Return the TickRecord of the i-th recorded tick."""
+        if i < 0:
+            i += self._len
+        if not 0 <= i < self._len:
+            raise IndexError("No such tick: {}".format(i))
+        header, command, codes = self._codes(*self._entry(i))
+        return TickRecord(header[1], header[2], decode(codes), command, header[4], header[5])
+
+    def __getitem__(self, i):
+        return self.get(i)
+
+    def __iter__(self):
+        """ Yields all indexed ticks in order.
+
+        A record right after the previous one is applied to its codes, any
+        other is decoded from its keyframe, data the index skips is never
+        read.
+        """
+        expected = None
+        codes = None
+        for i in range(self._len):
+            offset, keyframe_offset = self._entry(i)
+            if offset == expected:
+                header, command, payload, expected = self._read(offset)
+                codes = self._apply(codes, header, payload)
+            else:
+                header, command, codes = self._codes(offset, keyframe_offset)
+                expected = self._end(offset)
+            yield TickRecord(header[1], header[2], decode(codes), command, header[4], header[5])
+
+    def close(self):
+        self._data.close()
+        if self._index:
+            self._index.close()
+
+
+if __name__ == '__main__':
+    raise RuntimeError("This module is not designed to be ran from CLI")
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+
+###
+# #%L
+# Codenjoy - it's a dojo-like platform from developers to developers.
+# %%
+# Copyright (C) 2018 Codenjoy
+# %%
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public
+# License along with this program.  If not, see
+# <http://www.gnu.org/licenses/gpl-3.0.html>.
+# #L%
+###
+
+"""
+Offline replay benchmark for DirectionSolver.
+
+Streams recorded boards through the solver the same way the web client
+does and reports the decision speed:
+
+    ./replay.py games.rec --output after.json
+    ./replay.py --compare before.json after.json
+
+Inputs are game recordings or text files with one board per line
+(optionally prefixed with 'board=').
+"""
+
+import argparse
+import json
+import logging
+import resource
+from time import perf_counter
+import webclient
+from profiler import percentile
+from recorder import GameReader, MAGIC
+
+
+def load_games(path, games=None, ticks=None):
+    """ Return the list of games in the file, each one a list of board strings."""
+    with open(path, 'rb') as f:
+        is_recording = f.read(len(MAGIC)) == MAGIC
+    result = []
+    if is_recording:
+        reader = GameReader(path)
+        game = None
+        for record in reader:
+            if record.game != game:
+                game = record.game
+                result.append([])
+            result[-1].append(record.board)
+        reader.close()
+    else:
+        with open(path) as f:
+            result.append([line.strip() for line in f if line.strip()])
+    if games:
+        result = result[:games]
+    if ticks:
+        result = [game[:ticks] for game in result]
+    return result
+
+
+class _ReplayClient:
+    """ Stands in for WebClient, collects the commands instead of sending them."""
+    def __init__(self, solver):
+        self._solver = solver
+        self._recorder = None
+        self._session_saved = True
+        self._startup = None
+        self.sent = []
+
+    def send(self, command):
+        self.sent.append(command)
+
+
+def replay(games, solver_factory):
+    """ Play the games through fresh solvers and return the benchmark report."""
+    latencies = []
+    searches = []
+    started = perf_counter()
+    for game in games:
+        solver = solver_factory()
+        client = _ReplayClient(solver)
+        for board in game:
+            tick_start = perf_counter()
+            webclient._on_message(client, "board=" + board)
+            latencies.append(perf_counter() - tick_start)
+            # read per tick, the profiler window is shorter than a long game
+            searches.append(solver.profiler.get_tick_count("path_searches"))
+    seconds = perf_counter() - started
+    latencies.sort()
+    searches.sort()
+    return {
+        "games": len(games),
+        "ticks": len(latencies),
+        "seconds": seconds,
+        "ticks_per_sec": len(latencies) / seconds if seconds else 0,
+        "latency_ms": {
+            "mean": 1000 * sum(latencies) / len(latencies) if latencies else 0,
+            "p50": 1000 * percentile(latencies, 50),
+            "p95": 1000 * percentile(latencies, 95),
+            "p99": 1000 * percentile(latencies, 99),
+            "max": 1000 * (latencies[-1] if latencies else 0),
+        },
+        "path_searches": {
+            "mean": sum(searches) / len(searches) if searches else 0,
+            "p95": percentile(searches, 95),
+            "max": searches[-1] if searches else 0,
+        },
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def _flatten(report, prefix=""):
+    for key, value in report.items():
+        if isinstance(value, dict):
+            yield from _flatten(value, prefix + key + ".")
+        else:
+            yield prefix + key, value
+
+
+def compare(base, new):
+    """ Return a side by side text table of two reports."""
+    new_values = dict(_flatten(new))
+    lines = ["{:<24}{:>14}{:>14}{:>10}".format("metric", "base", "new", "change")]
+    for key, value in _flatten(base):
+        other = new_values.get(key)
+        change = ""
+        if other is not None and value:
+            change = "{:+.1f}%".format(100 * (other - value) / value)
+        lines.append("{:<24}{:>14.3f}{:>14.3f}{:>10}".format(key, value, other or 0, change))
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded boards through DirectionSolver")
+    parser.add_argument("inputs", nargs="*", help="game recordings or board text files")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--games", type=int, help="max games to replay per input")
+    parser.add_argument("--ticks", type=int, help="max ticks to replay per game")
+    parser.add_argument("--log", action="store_true", help="keep the solver logging on")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"),
+                        help="compare two JSON reports side by side")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as a, open(args.compare[1]) as b:
+            print(compare(json.load(a), json.load(b)))
+        return
+    if not args.inputs:
+        parser.error("nothing to replay")
+
+    from dds import DirectionSolver
+    if not args.log:
+        logging.getLogger("bot").setLevel(logging.WARNING)
+    games = []
+    for path in args.inputs:
+        games.extend(load_games(path, args.games, args.ticks))
+    report = replay(games, DirectionSolver)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+
+###
+# #%L
+# Codenjoy - it's a dojo-like platform from developers to developers.
+# %%
+# Copyright (C) 2018 Codenjoy
+# %%
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public
+# License along with this program.  If not, see
+# <http://www.gnu.org/licenses/gpl-3.0.html>.
+# #L%
+###
+
+"""
+Headless Bomberman game for offline play.
+
+Implements the rules the bot models: walls and destroyable walls, bombs
+with timers 5..1 and chain reactions, blast range perks, bomb count,
+immunity and remote control perks, meat choppers and several bombermen.
+Boards are rendered per player in the server format, commands are the
+strings DirectionSolver.get returns ("ACT,LEFT", "UP", "" ...).
+"""
+
+import random
+from dataclasses import dataclass, field
+from element import _ELEMENTS
+
+BOMB_TIMER = 5
+BLAST_RANGE = 3
+PERK_DURATION = 30
+RANGE_INC = 2
+BOMB_COUNT_INC = 3
+RC_CHARGES = 3
+PERK_CHANCE = 0.1
+
+SCORE_WALL = 10
+SCORE_CHOPPER = 100
+SCORE_KILL = 1000
+SCORE_DEATH = -50
+
+_MOVES = {
+    "LEFT": (-1, 0),
+    "RIGHT": (1, 0),
+    "UP": (0, -1),
+    "DOWN": (0, 1),
+}
+_PERKS = [
+    _ELEMENTS["BOMB_BLAST_RADIUS_INCREASE"],
+    _ELEMENTS["BOMB_COUNT_INCREASE"],
+    _ELEMENTS["BOMB_IMMUNE"],
+    _ELEMENTS["BOMB_REMOTE_CONTROL"],
+]
+_WALL = _ELEMENTS["WALL"]
+_DESTROY_WALL = _ELEMENTS["DESTROY_WALL"]
+_NONE = _ELEMENTS["NONE"]
+
+
+@dataclass
+class Bomberman:
+    pnt: tuple
+    alive: bool = True
+    score: int = 0
+    deaths: int = 0
+    kills: int = 0
+    range_ticks: int = 0
+    count_ticks: int = 0
+    immune_ticks: int = 0
+    rc: int = 0
+
+    def blast_range(self):
+        return BLAST_RANGE + (RANGE_INC if self.range_ticks else 0)
+
+    def max_bombs(self):
+        return 1 + (BOMB_COUNT_INC if self.count_ticks else 0)
+
+
+@dataclass
+class Bomb:
+    owner: int
+    pnt: tuple
+    range: int
+    timer: int = BOMB_TIMER
+    rc: bool = False
+    placed: int = 0
+
+
+@dataclass
+class Chopper:
+    pnt: tuple
+    dir: tuple = field(default=(0, 0))
+
+
+class Simulator:
+    """ In-process Bomberman game.
+
+    The static layer (walls, destroyable walls, perks) is kept as a flat
+    list of chars, bombs, choppers and players are overlaid when a board
+    is rendered.
+    """
+    def __init__(self, size=23, players=1, choppers=5, wall_density=0.3, seed=None):
+        self._rnd = random.Random(seed)
+        self.size = size
+        self.tick = 0
+        self._cells = [_NONE] * (size * size)
+        for y in range(size):
+            for x in range(size):
+                if x in (0, size - 1) or y in (0, size - 1) or (x % 2 == 0 and y % 2 == 0):
+                    self._cells[y * size + x] = _WALL
+                elif self._rnd.random() < wall_density:
+                    self._cells[y * size + x] = _DESTROY_WALL
+        self._walls_count = self._cells.count(_DESTROY_WALL)
+        self._choppers_count = choppers
+        self.bombs = []
+        self.choppers = []
+        self.players = []
+        self._blasts = set()
+        self._destroyed = set()
+        self._dead_choppers = set()
+        for _ in range(players):
+            self.players.append(Bomberman(self._spawn_point()))
+        for _ in range(choppers):
+            self.choppers.append(Chopper(self._spawn_point()))
+
+    def _index(self, pnt):
+        return pnt[1] * self.size + pnt[0]
+
+    def _is_free(self, pnt):
+        x, y = pnt
+        return 0 <= x < self.size and 0 <= y < self.size and \
+               self._cells[y * self.size + x] not in (_WALL, _DESTROY_WALL)
+
+    def _bomb_at(self, pnt):
+        for bomb in self.bombs:
+            if bomb.pnt == pnt:
+                return bomb
+        return None
+
+    def _spawn_point(self):
+        """ A random empty cell without bombs, choppers and players."""
+        taken = {b.pnt for b in self.bombs} | {c.pnt for c in self.choppers} | \
+                {p.pnt for p in self.players}
+        while True:
+            pnt = (self._rnd.randrange(1, self.size - 1), self._rnd.randrange(1, self.size - 1))
+            if self._cells[self._index(pnt)] == _NONE and pnt not in taken:
+                return pnt
+
+    def _place_bomb(self, i, player):
+        if self._bomb_at(player.pnt):
+            return
+        if player.rc:
+            player.rc -= 1
+            self.bombs.append(Bomb(i, player.pnt, player.blast_range(), rc=True, placed=self.tick))
+        elif sum(1 for b in self.bombs if b.owner == i and not b.rc) < player.max_bombs():
+            self.bombs.append(Bomb(i, player.pnt, player.blast_range(), placed=self.tick))
+
+    def _act(self, i, player):
+        rc_bombs = [b for b in self.bombs if b.owner == i and b.rc]
+        if rc_bombs:
+            for bomb in rc_bombs:
+                bomb.timer = 0
+        else:
+            self._place_bomb(i, player)
+
+    def _move(self, player, direction):
+        dx, dy = _MOVES[direction]
+        pnt = (player.pnt[0] + dx, player.pnt[1] + dy)
+        if self._is_free(pnt) and not self._bomb_at(pnt):
+            player.pnt = pnt
+            self._pickup(player)
+
+    def _pickup(self, player):
+        i = self._index(player.pnt)
+        perk = self._cells[i]
+        if perk not in _PERKS:
+            return
+        self._cells[i] = _NONE
+        if perk == _ELEMENTS["BOMB_BLAST_RADIUS_INCREASE"]:
+            player.range_ticks += PERK_DURATION
+        elif perk == _ELEMENTS["BOMB_COUNT_INCREASE"]:
+            player.count_ticks = PERK_DURATION
+        elif perk == _ELEMENTS["BOMB_IMMUNE"]:
+            player.immune_ticks = PERK_DURATION
+        else:
+            player.rc = RC_CHARGES
+
+    def _command(self, i, player, command):
+        acts = [a.strip().upper() for a in (command or "").split(",")]
+        moved = False
+        for act in acts:
+            if act == "ACT":
+                self._act(i, player)
+            elif act in _MOVES and not moved:
+                self._move(player, act)
+                moved = True
+
+    def _move_choppers(self):
+        taken = {c.pnt for c in self.choppers}
+        for chopper in self.choppers:
+            x, y = chopper.pnt
+            options = [(dx, dy) for dx, dy in _MOVES.values()
+                       if self._is_free((x + dx, y + dy)) and not self._bomb_at((x + dx, y + dy))
+                       and (x + dx, y + dy) not in taken]
+            if not options:
+                continue
+            if chopper.dir not in options or self._rnd.random() < 0.1:
+                chopper.dir = self._rnd.choice(options)
+            taken.discard(chopper.pnt)
+            chopper.pnt = (x + chopper.dir[0], y + chopper.dir[1])
+            taken.add(chopper.pnt)
+
+    def _explode(self):
+        """ Detonates bombs with expired timers, chain reactions included."""
+        queue = [b for b in self.bombs if b.timer <= 0]
+        exploded = set()
+        while queue:
+            bomb = queue.pop()
+            if id(bomb) in exploded:
+                continue
+            exploded.add(id(bomb))
+            self._blasts.add(bomb.pnt)
+            for dx, dy in _MOVES.values():
+                for r in range(1, bomb.range + 1):
+                    pnt = (bomb.pnt[0] + dx * r, bomb.pnt[1] + dy * r)
+                    if not (0 <= pnt[0] < self.size and 0 <= pnt[1] < self.size):
+                        break
+                    cell = self._cells[self._index(pnt)]
+                    if cell == _WALL:
+                        break
+                    if cell == _DESTROY_WALL:
+                        self._destroy_wall(pnt, bomb.owner)
+                        break
+                    other = self._bomb_at(pnt)
+                    if other:
+                        queue.append(other)
+                        break
+                    self._blasts.add(pnt)
+                    if cell in _PERKS:
+                        self._cells[self._index(pnt)] = _NONE
+            self._hit(bomb.owner)
+        self.bombs = [b for b in self.bombs if id(b) not in exploded]
+
+    def _destroy_wall(self, pnt, owner):
+        self._destroyed.add(pnt)
+        self._cells[self._index(pnt)] = _NONE
+        if self._rnd.random() < PERK_CHANCE:
+            self._cells[self._index(pnt)] = self._rnd.choice(_PERKS)
+        self.players[owner].score += SCORE_WALL
+
+    def _hit(self, owner):
+        for chopper in list(self.choppers):
+            if chopper.pnt in self._blasts:
+                self.choppers.remove(chopper)
+                self._dead_choppers.add(chopper.pnt)
+                self.players[owner].score += SCORE_CHOPPER
+        for i, player in enumerate(self.players):
+            if player.alive and player.pnt in self._blasts and not player.immune_ticks:
+                self._kill(player)
+                if i != owner:
+                    self.players[owner].score += SCORE_KILL
+                    self.players[owner].kills += 1
+
+    def _kill(self, player):
+        player.alive = False
+        player.deaths += 1
+        player.score += SCORE_DEATH
+
+    def _respawn(self, player):
+        player.pnt = self._spawn_point()
+        player.alive = True
+        player.range_ticks = player.count_ticks = player.immune_ticks = player.rc = 0
+
+    def _regenerate(self):
+        if len(self.choppers) < self._choppers_count:
+            self.choppers.append(Chopper(self._spawn_point()))
+        if self._cells.count(_DESTROY_WALL) < self._walls_count:
+            self._cells[self._index(self._spawn_point())] = _DESTROY_WALL
+
+    def step(self, commands):
+        """ Play one tick, commands is a list with a command per player."""
+        self._blasts = set()
+        self._destroyed = set()
+        self._dead_choppers = set()
+        for i, player in enumerate(self.players):
+            if not player.alive:
+                self._respawn(player)
+                continue
+            self._command(i, player, commands[i])
+        self._move_choppers()
+        for bomb in self.bombs:
+            # bombs placed this tick start counting down on the next one
+            if not bomb.rc and bomb.placed < self.tick:
+                bomb.timer -= 1
+        self._explode()
+        chopper_cells = {c.pnt for c in self.choppers}
+        for player in self.players:
+            if player.alive and player.pnt in chopper_cells:
+                self._kill(player)
+            for perk in ("range_ticks", "count_ticks", "immune_ticks"):
+                setattr(player, perk, max(0, getattr(player, perk) - 1))
+        self._regenerate()
+        self.tick += 1
+
+    def board_for(self, i):
+        """ Return the board string as player i sees it."""
+        cells = list(self._cells)
+        for pnt in self._destroyed:
+            cells[self._index(pnt)] = _ELEMENTS["DESTROYED_WALL"]
+        for pnt in self._blasts:
+            cells[self._index(pnt)] = _ELEMENTS["BOOM"]
+        for bomb in self.bombs:
+            cells[self._index(bomb.pnt)] = str(max(1, min(BOMB_TIMER, bomb.timer)))
+        for pnt in self._dead_choppers:
+            cells[self._index(pnt)] = _ELEMENTS["DEAD_MEAT_CHOPPER"]
+        for chopper in self.choppers:
+            cells[self._index(chopper.pnt)] = _ELEMENTS["MEAT_CHOPPER"]
+        bomb_cells = {b.pnt for b in self.bombs}
+        # our own bomberman is drawn last, on top of the others
+        order = [j for j in range(len(self.players)) if j != i] + [i]
+        for j in order:
+            player = self.players[j]
+            if not player.alive:
+                name = "DEAD_BOMBERMAN"
+            elif player.pnt in bomb_cells:
+                name = "BOMB_BOMBERMAN"
+            else:
+                name = "BOMBERMAN"
+            cells[self._index(player.pnt)] = _ELEMENTS[("" if i == j else "OTHER_") + name]
+        return "".join(cells)
+
+    def play(self, solvers, ticks):
+        """ Let the solvers play for the given number of ticks.
+
+        solvers is a list with an object providing get(board_string) per
+        player. Returns the list of players.
+        """
+        for _ in range(ticks):
+            commands = [solver.get(self.board_for(i)) for i, solver in enumerate(solvers)]
+            self.step(commands)
+        return self.players
+
+
+if __name__ == '__main__':
+    raise RuntimeError("This module is not designed to be ran from CLI")
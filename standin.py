@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+
+###
+# #%L
+# Codenjoy - it's a dojo-like platform from developers to developers.
+# %%
+# Copyright (C) 2018 Codenjoy
+# %%
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public
+# License along with this program.  If not, see
+# <http://www.gnu.org/licenses/gpl-3.0.html>.
+# #L%
+###
+
+"""
+Local stand-in for the game server, for end-to-end load tests of the client.
+
+Speaks the server protocol on /codenjoy-contest/ws?user=...&code=...: sends
+a 'board=...' text frame every tick and takes one command back per frame.
+Boards come from recordings or from a simulator game driven by the client
+commands. Per-frame round-trip time and missed ticks are reported:
+
+    ./standin.py --client --rate 1,5,10,20 --size 23,31
+    ./standin.py --port 8080 --replay games.rec --rate 2
+
+Without --client it waits for an external bot on the port, e.g. main.py
+pointed at http://127.0.0.1:8080/codenjoy-contest/board/player/standin?code=0
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import logging
+import socket
+import struct
+import threading
+from collections import deque
+from time import perf_counter, sleep
+from urllib.parse import urlparse, parse_qs
+from profiler import percentile
+from websocket import ABNF, STATUS_NORMAL
+
+WS_PATH = "/codenjoy-contest/ws"
+_ACCEPT_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+class RecordedBoards:
+    """ Boards of recorded games in a loop, the commands are ignored."""
+    def __init__(self, games):
+        self._boards = [board for game in games for board in game]
+        self._i = 0
+
+    def next(self, command):
+        board = self._boards[self._i % len(self._boards)]
+        self._i += 1
+        return board
+
+
+class SimulatedBoards:
+    """ Simulator game where player 0 is the client, other players stand still."""
+    def __init__(self, size=23, players=1, choppers=5, seed=None):
+        from simulator import Simulator
+        self._sim = Simulator(size=size, players=players, choppers=choppers, seed=seed)
+        self._started = False
+
+    def next(self, command):
+        if self._started:
+            self._sim.step([command] + [""] * (len(self._sim.players) - 1))
+        self._started = True
+        return self._sim.board_for(0)
+
+
+class _Session:
+    """ Frames sent and replies received on one connection.
+
+    The in-process client tells which frame it answers, see _TaggedSolver,
+    so frames it skips are told apart from late replies. Replies of an
+    external client are taken to answer the frames in order.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = deque()
+        self.tick = -1
+        self.sent_at = {}
+        self.frames = {}
+        self.answering = None
+        self.commands = {}
+        self.rtts = []
+        self.late = 0
+        self.closed = threading.Event()
+
+    def sent(self, tick, board, at):
+        with self.lock:
+            self.tick = tick
+            self.sent_at[tick] = at
+            self.frames[board] = tick
+            self.pending.append(tick)
+
+    def answering_board(self, board):
+        """ The client is about to reply to the frame of the board."""
+        with self.lock:
+            if self.answering is None:
+                self.answering = deque()
+            self.answering.append(self.frames.get(board))
+
+    def replied(self, command, at):
+        """ Replies to a frame after a newer one was sent are late."""
+        with self.lock:
+            if self.answering is not None:
+                tick = self.answering.popleft() if self.answering else None
+            else:
+                tick = self.pending.popleft() if self.pending else None
+            if tick is None:
+                return
+            self.rtts.append(at - self.sent_at[tick])
+            if tick == self.tick:
+                self.commands[tick] = command
+            else:
+                self.late += 1
+
+    def command_for(self, tick):
+        with self.lock:
+            return self.commands.pop(tick, None)
+
+
+class _TaggedSolver:
+    """ Wraps the in-process solver to tell the server which frame each
+    reply answers, the commands carry no tick.
+    """
+    def __init__(self, solver, server):
+        self._solver = solver
+        self._server = server
+
+    def get(self, board_string, **kwargs):
+        command = self._solver.get(board_string, **kwargs)
+        # the reply is sent after get() returns, so this is known before it arrives
+        self._server.session.answering_board(board_string)
+        return command
+
+    def __getattr__(self, name):
+        return getattr(self._solver, name)
+
+
+class StandInServer:
+    """ Serves one game per connection at the given tick rate."""
+    def __init__(self, source_factory, rate=1.0, ticks=100, host="127.0.0.1", port=0):
+        self._source_factory = source_factory
+        self._period = 1.0 / rate
+        self._ticks = ticks
+        self._listener = socket.create_server((host, port))
+        self.session = None
+        self.host, self.port = self._listener.getsockname()[:2]
+
+    @property
+    def url(self):
+        return "ws://{}:{}{}?user=standin&code=0".format(self.host, self.port, WS_PATH)
+
+    def close(self):
+        self._listener.close()
+
+    def serve_one(self):
+        """ Accept a client, play a game with it and return the report."""
+        conn, _ = self._listener.accept()
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        rfile = conn.makefile('rb')
+        try:
+            if not self._handshake(conn, rfile):
+                return None
+            return self._play(conn, rfile)
+        finally:
+            rfile.close()
+            conn.close()
+
+    @staticmethod
+    def _handshake(conn, rfile):
+        request = rfile.readline().decode("utf-8").split()
+        headers = {}
+        while True:
+            line = rfile.readline().decode("utf-8")
+            if line in ("\r\n", "\n", ""):
+                break
+            key, _, value = line.partition(":")
+            headers[key.strip().lower()] = value.strip()
+        url = urlparse(request[1]) if len(request) > 1 else None
+        query = parse_qs(url.query) if url else {}
+        if (not url or url.path != WS_PATH or "user" not in query or "code" not in query
+                or "sec-websocket-key" not in headers):
+            conn.sendall(b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n\r\n")
+            return False
+        digest = hashlib.sha1((headers["sec-websocket-key"] + _ACCEPT_GUID).encode("utf-8")).digest()
+        conn.sendall("HTTP/1.1 101 Switching Protocols\r\n"
+                     "Upgrade: websocket\r\n"
+                     "Connection: Upgrade\r\n"
+                     "Sec-WebSocket-Accept: {}\r\n\r\n"
+                     .format(base64.b64encode(digest).decode("utf-8")).encode("utf-8"))
+        return True
+
+    @staticmethod
+    def _send(conn, data, opcode=ABNF.OPCODE_TEXT):
+        # server frames are not masked
+        conn.sendall(ABNF(1, 0, 0, 0, opcode, 0, data).format())
+
+    @staticmethod
+    def _read_frame(rfile):
+        header = rfile.read(2)
+        if len(header) < 2:
+            return ABNF.OPCODE_CLOSE, b""
+        opcode = header[0] & 0xf
+        length = header[1] & 0x7f
+        if length == 0x7e:
+            length = struct.unpack("!H", rfile.read(2))[0]
+        elif length == 0x7f:
+            length = struct.unpack("!Q", rfile.read(8))[0]
+        mask_key = rfile.read(4) if header[1] >> 7 else None
+        payload = rfile.read(length)
+        if mask_key:
+            payload = ABNF.mask(mask_key, payload)
+        return opcode, payload
+
+    def _reader(self, conn, rfile, session):
+        try:
+            while True:
+                opcode, payload = self._read_frame(rfile)
+                if opcode == ABNF.OPCODE_TEXT:
+                    session.replied(payload.decode("utf-8"), perf_counter())
+                elif opcode == ABNF.OPCODE_PING:
+                    self._send(conn, payload, ABNF.OPCODE_PONG)
+                elif opcode == ABNF.OPCODE_CLOSE:
+                    break
+        except (OSError, ValueError):
+            pass
+        session.closed.set()
+
+    def tagged(self, solver):
+        """ Return the in-process solver wrapped to report the frames it answers."""
+        return _TaggedSolver(solver, self)
+
+    def _play(self, conn, rfile):
+        session = self.session = _Session()
+        reader = threading.Thread(target=self._reader, args=(conn, rfile, session), daemon=True)
+        reader.start()
+        source = self._source_factory()
+        command = ""
+        missed = 0
+        ticks = 0
+        next_at = perf_counter()
+        for tick in range(self._ticks):
+            if session.closed.is_set():
+                break
+            if tick:
+                command = session.command_for(tick - 1)
+                if command is None:
+                    missed += 1
+                    command = ""
+            board = source.next(command)
+            session.sent(tick, board, perf_counter())
+            self._send(conn, ("board=" + board).encode("utf-8"))
+            ticks += 1
+            next_at = max(next_at + self._period, perf_counter())
+            sleep(max(0, next_at - perf_counter()))
+        if ticks and session.command_for(ticks - 1) is None:
+            missed += 1
+        try:
+            self._send(conn, struct.pack("!H", STATUS_NORMAL), ABNF.OPCODE_CLOSE)
+        except OSError:
+            pass
+        session.closed.wait(1)
+        rtts = sorted(session.rtts)
+        return {
+            "ticks": ticks,
+            "answered": len(rtts),
+            "missed": missed,
+            "late": session.late,
+            "rtt_ms": {
+                "mean": 1000 * sum(rtts) / len(rtts) if rtts else 0,
+                "p50": 1000 * percentile(rtts, 50),
+                "p95": 1000 * percentile(rtts, 95),
+                "p99": 1000 * percentile(rtts, 99),
+                "max": 1000 * (rtts[-1] if rtts else 0),
+            },
+        }
+
+
+def run_client(server, deadline, use_async=False):
+    """ Start the bot for the server on a thread, the same way main.py does."""
+    from dds import DirectionSolver
+    if use_async:
+        from aioclient import AsyncWebClient as WebClient
+    else:
+        from webclient import WebClient
+    solver = server.tagged(DirectionSolver(deadline=deadline, speculative=True))
+    client = WebClient(url=server.url, solver=solver)
+    if use_async:
+        run = client.run_forever
+    else:
+        # the server is gone after the run, retrying it would never end
+        run = lambda: client.run_forever(reconnect=False)
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def format_results(results):
+    lines = ["{:>6}{:>6}{:>7}{:>8}{:>6}{:>10}{:>10}{:>10}{:>10}".format(
+        "rate", "size", "ticks", "missed", "late", "p50 ms", "p95 ms", "p99 ms", "max ms")]
+    for r in results:
+        rtt = r["rtt_ms"]
+        lines.append("{:>6}{:>6}{:>7}{:>8}{:>6}{:>10.2f}{:>10.2f}{:>10.2f}{:>10.2f}".format(
+            r["rate"], r["size"], r["ticks"], r["missed"], r["late"],
+            rtt["p50"], rtt["p95"], rtt["p99"], rtt["max"]))
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in game server for client load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--rate", default="1", help="ticks per second, comma separated list")
+    parser.add_argument("--size", default="23", help="board sizes, comma separated list")
+    parser.add_argument("--ticks", type=int, default=100, help="ticks per run")
+    parser.add_argument("--players", type=int, default=1)
+    parser.add_argument("--choppers", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--replay", nargs="*", help="serve boards of these recordings instead")
+    parser.add_argument("--client", action="store_true", help="run the bot in this process")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="run the in-process bot with the asyncio client")
+    parser.add_argument("--output", help="write the JSON results to this file")
+    args = parser.parse_args()
+
+    games = None
+    if args.replay:
+        from replay import load_games
+        games = [game for path in args.replay for game in load_games(path)]
+    if args.client:
+        logging.getLogger("bot").setLevel(logging.WARNING)
+
+    results = []
+    sizes = [None] if games else [int(s) for s in args.size.split(",")]
+    for size in sizes:
+        for rate in [float(r) for r in args.rate.split(",")]:
+            if games:
+                factory = lambda: RecordedBoards(games)
+            else:
+                factory = lambda: SimulatedBoards(size, args.players, args.choppers, args.seed)
+            server = StandInServer(factory, rate, args.ticks, args.host,
+                                   0 if args.client else args.port)
+            try:
+                if args.client:
+                    # answer within half a tick like main.py does for one second ticks
+                    client = run_client(server, 0.5 / rate, args.use_async)
+                else:
+                    print("Waiting for a client on {}".format(server.url))
+                report = server.serve_one()
+            finally:
+                server.close()
+            if args.client:
+                client.join(5)
+                if client.is_alive():
+                    print("The client did not stop after the run")
+            if report:
+                report.update(rate=rate, size=size or int(len(games[0][0]) ** 0.5))
+                results.append(report)
+                print(format_results(results[-1:]))
+
+    print(format_results(results))
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
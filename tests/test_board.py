@@ -0,0 +1,17 @@
+from board import Board, encode
+from element import Element, code_of
+
+
+def test_encode_known_glyphs():
+    wall = Element("WALL").get_char()
+    assert encode(wall + " #").tolist() == [code_of(wall), code_of(" "), code_of("#")]
+
+
+def test_encode_unknown_glyph_is_empty_space():
+    # one code point below and far above the known ones
+    assert encode(" \U0001f600?").tolist() == [code_of(" ")] * 3
+
+
+def test_board_with_unknown_glyph():
+    board = Board("\U0001f600" + " " * 8)
+    assert board.as_array().tolist() == [[code_of(" ")] * 3] * 3
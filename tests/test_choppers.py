@@ -0,0 +1,30 @@
+import numpy as np
+
+from dds import ChoppersInfo
+from point import Point
+
+
+def test_fresh_choppers_info_has_no_danger():
+    info = ChoppersInfo()
+    for t in range(4):
+        assert not info.is_danger(Point(1, 1), t)
+        assert not info._danger_at(t)
+
+
+def test_fresh_choppers_info_adds_no_costs():
+    class Grid:
+        def add_penalty(self, mask, penalty):
+            raise AssertionError("no penalty expected")
+
+        def add_costs(self, costs):
+            raise AssertionError("no costs expected")
+
+    ChoppersInfo().add_costs(Grid(), 10)
+
+
+def test_reset_forgets_the_board():
+    info = ChoppersInfo()
+    info._near = np.ones((3, 3), dtype=bool)
+    info._size = 3
+    info.reset()
+    assert not info.is_danger(Point(1, 1), 1)
@@ -0,0 +1,19 @@
+import pytest
+
+from element import Element, code_of, value_of
+
+
+def test_code_of_known_char():
+    assert code_of(Element("WALL").get_char()) == Element("WALL").get_code()
+
+
+def test_code_of_unknown_char():
+    with pytest.raises(KeyError):
+        code_of("?")
+
+
+def test_unknown_element_name_or_char():
+    with pytest.raises(KeyError):
+        Element("NO_SUCH_ELEMENT")
+    with pytest.raises(KeyError):
+        value_of("?")
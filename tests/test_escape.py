@@ -0,0 +1,64 @@
+import random
+from collections import deque
+
+import numpy as np
+
+from board import Board
+from escape import EscapePlanner
+from point import Point
+
+SIZE = 9
+HORIZON = 7
+
+
+def _bfs(passable, start, danger, safe):
+    """ The per-cell search the planner replaced, the reference."""
+    queue = deque([(start, 0)])
+    parents = {(start, 0): None}
+    last = (start, 0)
+    while queue:
+        state = queue.popleft()
+        (x, y), t = last = state
+        if safe(t)[y, x]:
+            break
+        if t == HORIZON:
+            continue
+        for nx, ny in ((x, y), (x, y + 1), (x, y - 1), (x - 1, y), (x + 1, y)):
+            if (nx, ny) != (x, y) and not (0 <= nx < SIZE and 0 <= ny < SIZE and passable[ny, nx]):
+                continue
+            nstate = ((nx, ny), t + 1)
+            if nstate not in parents and not danger(t + 1)[ny, nx]:
+                parents[nstate] = state
+                queue.append(nstate)
+    path = []
+    while last:
+        path.append(last[0])
+        last = parents[last]
+    return path[::-1]
+
+
+def _check(path, passable, danger):
+    for t, ((x, y), (nx, ny)) in enumerate(zip(path, path[1:]), 1):
+        assert abs(x - nx) + abs(y - ny) <= 1
+        assert (x, y) == (nx, ny) or passable[ny, nx]
+        assert not danger(t)[ny, nx]
+
+
+def test_bitset_search_matches_the_bfs():
+    rnd = random.Random(1)
+    board = Board(" " * SIZE * SIZE)
+    for _ in range(300):
+        passable = np.array([[rnd.random() < 0.7 for _ in range(SIZE)] for _ in range(SIZE)])
+        dangers = [np.array([[rnd.random() < 0.2 for _ in range(SIZE)] for _ in range(SIZE)])
+                   for _ in range(HORIZON + 1)]
+        safes = [np.array([[rnd.random() < 0.03 for _ in range(SIZE)] for _ in range(SIZE)])
+                 for _ in range(HORIZON + 1)]
+        start = (rnd.randrange(SIZE), rnd.randrange(SIZE))
+        danger, safe = dangers.__getitem__, safes.__getitem__
+        expected = _bfs(passable, start, danger, safe)
+        path = EscapePlanner(board.get_bitboard(), passable, HORIZON).find_path(Point(*start), danger, safe)
+        assert path[0] == start
+        assert len(path) == len(expected)
+        _check(path, passable, danger)
+        last = path[-1]
+        assert safe(len(path) - 1)[last[1], last[0]] == safe(len(expected) - 1)[expected[-1][1], expected[-1][0]]
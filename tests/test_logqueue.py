@@ -0,0 +1,24 @@
+import logging
+import queue
+
+from logqueue import DroppingQueueHandler, LazyStr
+
+
+def _record(msg, *args):
+    return logging.LogRecord("bot", logging.DEBUG, __file__, 1, msg, args, None)
+
+
+def test_immutable_args_are_left_to_the_writer():
+    handler = DroppingQueueHandler(queue.Queue())
+    record = handler.prepare(_record("%s %d %s %s", "a", 1, (2, 3), LazyStr(lambda: "x")))
+    assert record.args[:3] == ("a", 1, (2, 3))
+    assert record.getMessage() == "a 1 (2, 3) x"
+
+
+def test_mutable_args_are_formatted_at_once():
+    handler = DroppingQueueHandler(queue.Queue())
+    items = [1]
+    record = handler.prepare(_record("%s", items))
+    items.append(2)
+    assert record.args is None
+    assert record.getMessage() == "[1]"
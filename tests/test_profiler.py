@@ -0,0 +1,20 @@
+from profiler import percentile
+
+
+def test_percentile_nearest_rank():
+    ten = list(range(1, 11))
+    assert percentile(ten, 50) == 5
+    assert percentile(ten, 90) == 9
+    assert percentile(ten, 95) == 10
+    assert percentile(ten, 100) == 10
+    assert percentile(ten, 0) == 1
+
+
+def test_percentile_small():
+    four = [10, 20, 30, 40]
+    assert percentile(four, 25) == 10
+    assert percentile(four, 50) == 20
+    assert percentile(four, 75) == 30
+    assert percentile(four, 76) == 40
+    assert percentile([7], 99) == 7
+    assert percentile([], 50) == 0
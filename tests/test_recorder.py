@@ -0,0 +1,53 @@
+import os
+
+from recorder import GameReader, GameRecorder
+
+BOARDS = ["#" * k + " " * (9 - k) for k in range(9)]
+
+
+def _record(path, boards, commands):
+    recorder = GameRecorder(path, keyframe_every=2)
+    recorder.new_game()
+    for board, command in zip(boards, commands):
+        recorder.record(board, command, 0.0, 0.0)
+    recorder.close()
+
+
+def _read(path):
+    reader = GameReader(path)
+    try:
+        return [(r.board, r.command) for r in reader], [reader[i] for i in range(len(reader))]
+    finally:
+        reader.close()
+
+
+def _crash(path, ticks):
+    """ Leave the files as a kill after the index kept only `ticks` entries would."""
+    with open(path + '.idx', 'rb') as f:
+        entries = f.read()
+    with open(path + '.idx', 'wb') as f:
+        f.write(entries[:16 * ticks + 7])
+    # the next record is there, the one after it half written
+    reader = GameReader(path)
+    reader.close()
+    os.truncate(path, os.path.getsize(path) - 3)
+
+
+def test_crashed_recording_reads_the_indexed_ticks(tmp_path):
+    path = str(tmp_path / "games.rec")
+    _record(path, BOARDS[:5], "ABCDE")
+    _crash(path, 3)
+    ticks, got = _read(path)
+    assert ticks == [(b, c) for b, c in zip(BOARDS[:3], "ABC")]
+    assert [(r.board, r.command) for r in got] == ticks
+
+
+def test_resumed_recording_drops_the_leftovers(tmp_path):
+    path = str(tmp_path / "games.rec")
+    _record(path, BOARDS[:5], "ABCDE")
+    _crash(path, 3)
+    _record(path, BOARDS[5:8], "FGH")
+    ticks, got = _read(path)
+    assert ticks == list(zip(BOARDS[:3] + BOARDS[5:8], "ABCFGH"))
+    assert [(r.board, r.command) for r in got] == ticks
+    assert [r.game for r in got] == [0, 0, 0, 1, 1, 1]
@@ -0,0 +1,43 @@
+import logging
+
+from dds import DirectionSolver
+from element import _ELEMENTS
+from simulator import Simulator
+
+
+
+def _predictions(seed, ticks):
+    """ Yields (predicted, actual) next boards of a simulated game."""
+    sim = Simulator(size=15, players=1, choppers=4, seed=seed)
+    solver = DirectionSolver()
+    for _ in range(ticks):
+        command = solver.get(sim.board_for(0))
+        predicted = solver._predict_board()
+        sim.step([command])
+        if predicted is not None:
+            yield predicted, sim.board_for(0)
+
+
+def _counts(chars, seeds=range(3), ticks=100):
+    """ Return {char: (predicted, actual, agreed)} cell counts over the games."""
+    counts = {char: [0, 0, 0] for char in chars}
+    for seed in seeds:
+        for board, real in _predictions(seed, ticks):
+            for a, b in zip(board, real):
+                if a in counts:
+                    counts[a][0] += 1
+                    counts[a][2] += a == b
+                if b in counts:
+                    counts[b][1] += 1
+    return counts
+
+
+def test_predicted_blasts_match_the_simulator():
+    logging.getLogger("bot").setLevel(logging.WARNING)
+    counts = _counts([_ELEMENTS["BOOM"], _ELEMENTS["DESTROYED_WALL"], _ELEMENTS["DEAD_MEAT_CHOPPER"]])
+    for char in (_ELEMENTS["BOOM"], _ELEMENTS["DESTROYED_WALL"]):
+        predicted, actual, agreed = counts[char]
+        assert agreed >= 0.9 * predicted, char
+        assert agreed >= 0.6 * actual, char
+    # choppers step before the blast in the simulator, only their presence is checked
+    assert counts[_ELEMENTS["DEAD_MEAT_CHOPPER"]][0]
@@ -0,0 +1,24 @@
+from standin import _Session
+
+
+def test_replies_match_the_answered_frames():
+    session = _Session()
+    session.sent(0, "a", 0.0)
+    session.sent(1, "b", 1.0)
+    session.sent(2, "c", 2.0)
+    # the client skipped "b" and answers "a" late, then "c" on time
+    session.answering_board("a")
+    session.answering_board("c")
+    session.replied("UP", 2.5)
+    session.replied("DOWN", 2.25)
+    assert session.late == 1
+    assert session.command_for(1) is None
+    assert session.command_for(2) == "DOWN"
+    assert session.rtts == [2.5, 0.25]
+
+
+def test_external_replies_answer_in_order():
+    session = _Session()
+    session.sent(0, "a", 0.0)
+    session.replied("UP", 0.5)
+    assert session.command_for(0) == "UP"
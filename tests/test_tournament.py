@@ -0,0 +1,17 @@
+import pytest
+
+from tournament import sweep_configs
+
+
+def test_sweep_values_take_the_field_type():
+    configs = sweep_configs(["chopper_risk=0.1,0.3", "safe_moves=3"])
+    assert configs == {
+        "chopper_risk=0.1,safe_moves=3": {"chopper_risk": 0.1, "safe_moves": 3},
+        "chopper_risk=0.3,safe_moves=3": {"chopper_risk": 0.3, "safe_moves": 3},
+    }
+    assert isinstance(configs["chopper_risk=0.1,safe_moves=3"]["safe_moves"], int)
+
+
+def test_sweep_unknown_field():
+    with pytest.raises(ValueError):
+        sweep_configs(["no_such_field=1"])
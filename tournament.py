@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+
+###
+# #%L
+# Codenjoy - it's a dojo-like platform from developers to developers.
+# %%
+# Copyright (C) 2018 Codenjoy
+# %%
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public
+# License along with this program.  If not, see
+# <http://www.gnu.org/licenses/gpl-3.0.html>.
+# #L%
+###
+
+"""
+Self-play tournament of DirectionSolver configurations in the simulator.
+
+Games run in a process pool with a worker per core. Every finished game
+is appended to the results file as a JSON line, so an interrupted run
+continues where it stopped when started again with the same arguments.
+Games are keyed by their number and a hash of the configurations and
+game settings, changing either plays them again:
+
+    ./tournament.py --games 200 --sweep safe_moves=3,5,8 --sweep perk_radius=6,8
+    ./tournament.py --configs configs.json --results results.jsonl
+
+configs.json maps configuration names to SolverConfig fields.
+"""
+
+import argparse
+import dataclasses
+import hashlib
+import itertools
+import json
+import logging
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+def sweep_configs(sweeps):
+    """ Return {name: params} for every combination of "field=v1,v2" sweeps,
+    the values are converted to the type of the SolverConfig field.
+    """
+    from dds import SolverConfig
+    types = {field.name: field.type for field in dataclasses.fields(SolverConfig)}
+    fields = []
+    for sweep in sweeps:
+        name, values = sweep.split("=", 1)
+        if name not in types:
+            raise ValueError("No such SolverConfig field: {}".format(name))
+        fields.append([(name, types[name](v)) for v in values.split(",")])
+    configs = {}
+    for combo in itertools.product(*fields):
+        params = dict(combo)
+        configs[",".join("{}={}".format(k, v) for k, v in combo) or "default"] = params
+    return configs
+
+
+def _init_worker():
+    logging.getLogger("bot").setLevel(logging.WARNING)
+
+
+def play_game(game, names, configs, seed, ticks, size, choppers):
+    """ Play one game in the simulator, return its result dict."""
+    from dds import DirectionSolver, SolverConfig
+    from simulator import Simulator
+    solvers = [DirectionSolver(config=SolverConfig(**configs[name])) for name in names]
+    sim = Simulator(size=size, players=len(names), choppers=choppers, seed=seed)
+    players = sim.play(solvers, ticks)
+    result = []
+    for name, solver, player in zip(names, solvers, players):
+        latency = solver.profiler.stats()["timings"].get("total", {})
+        result.append({
+            "config": name,
+            "score": player.score,
+            "deaths": player.deaths,
+            "kills": player.kills,
+            "latency_p50": latency.get("p50", 0),
+            "latency_p95": latency.get("p95", 0),
+        })
+    return {"game": game, "seed": seed, "ticks": ticks, "players": result}
+
+
+def schedule(configs, games, players, seed):
+    """ Yields (game, names, seed), configurations take turns evenly."""
+    names = sorted(configs)
+    for game in range(games):
+        yield game, [names[(game + k) % len(names)] for k in range(players)], seed + game
+
+
+def config_hash(names, configs, ticks, size, choppers):
+    """ Return a digest of everything besides the seed that decides a game."""
+    text = json.dumps([[[name, configs[name]] for name in names], ticks, size, choppers],
+                      sort_keys=True)
+    return hashlib.sha1(text.encode()).hexdigest()[:16]
+
+
+def load_results(path):
+    results = []
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    results.append(json.loads(line))
+    return results
+
+
+def aggregate(results):
+    """ Return {config: summary} over all played games."""
+    totals = defaultdict(lambda: defaultdict(float))
+    for result in results:
+        for player in result["players"]:
+            t = totals[player["config"]]
+            t["games"] += 1
+            t["ticks"] += result["ticks"]
+            for key in ("score", "deaths", "kills", "latency_p50", "latency_p95"):
+                t[key] += player[key]
+    summary = {}
+    for name, t in totals.items():
+        games = t["games"]
+        summary[name] = {
+            "games": int(games),
+            "score": t["score"] / games,
+            "deaths_per_100_ticks": 100 * t["deaths"] / t["ticks"],
+            "kills": t["kills"] / games,
+            "latency_p50_ms": 1000 * t["latency_p50"] / games,
+            "latency_p95_ms": 1000 * t["latency_p95"] / games,
+        }
+    return summary
+
+
+def format_summary(summary):
+    lines = ["{:<40}{:>7}{:>10}{:>12}{:>8}{:>10}{:>10}".format(
+        "config", "games", "score", "deaths/100", "kills", "p50 ms", "p95 ms")]
+    for name, s in sorted(summary.items(), key=lambda x: -x[1]["score"]):
+        lines.append("{:<40}{:>7}{:>10.1f}{:>12.2f}{:>8.2f}{:>10.2f}{:>10.2f}".format(
+            name, s["games"], s["score"], s["deaths_per_100_ticks"], s["kills"],
+            s["latency_p50_ms"], s["latency_p95_ms"]))
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Self-play tournament of solver configurations")
+    parser.add_argument("--configs", help="JSON file with {name: SolverConfig fields}")
+    parser.add_argument("--sweep", action="append", default=[], metavar="FIELD=V1,V2",
+                        help="sweep a SolverConfig field over the values")
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--ticks", type=int, default=500)
+    parser.add_argument("--size", type=int, default=23)
+    parser.add_argument("--choppers", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--results", default="tournament.jsonl",
+                        help="results file, finished games in it are not replayed")
+    args = parser.parse_args()
+
+    configs = sweep_configs(args.sweep)
+    if args.configs:
+        with open(args.configs) as f:
+            configs = json.load(f)
+
+    keys = {}
+    for game, names, seed in schedule(configs, args.games, args.players, args.seed):
+        keys[game, config_hash(names, configs, args.ticks, args.size, args.choppers)] = names, seed
+    # results of other configurations in the same file are kept but not counted
+    results = [result for result in load_results(args.results)
+               if (result["game"], result.get("config_hash")) in keys]
+    done = {(result["game"], result["config_hash"]) for result in results}
+    jobs = [(key, names, seed) for key, (names, seed) in keys.items() if key not in done]
+    print("{} games done, {} to play on {} workers".format(len(done), len(jobs), args.workers))
+
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker) as pool, \
+            open(args.results, "a") as out:
+        futures = {pool.submit(play_game, game, names, configs, seed, args.ticks,
+                               args.size, args.choppers): digest
+                   for (game, digest), names, seed in jobs}
+        for future in as_completed(futures):
+            result = future.result()
+            result["config_hash"] = futures[future]
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+            results.append(result)
+
+    print(format_summary(aggregate(results)))
+
+
+if __name__ == '__main__':
+    main()
@@ -22,13 +22,27 @@
 # #L%
 ###
 
+import random
+import ssl
+from concurrent.futures import Future
 from sys import exc_info
+from time import perf_counter, sleep, time
 from traceback import print_exception
 from websocket import WebSocketApp
+from profiler import percentile
+
+# reconnect delays grow from the base up to the max, with random jitter
+RECONNECT_BASE = 0.5
+RECONNECT_MAX = 30
+# the server sends a board every second, this much silence is a stall
+STALL_TIMEOUT = 10
 
 
 def _on_open(webclient):
     print("Opened Connection.\nSending <NULL> command...")
+    webclient._connected()
+    if webclient._recorder:
+        webclient._recorder.new_game()
     #webclient.send('NULL')
 
 
@@ -38,9 +52,22 @@ def _on_message(webclient, message):
     Solver should provide a get function that takes a board string 
     and returns a Movement command to send.
     """
+    arrived_at = perf_counter()
+    timestamp = time()
+    if not webclient._session_saved:
+        webclient._save_session()
     try:
         board = message.lstrip("board=")
-        webclient.send(webclient._solver.get(board))
+        command = webclient._solver.get(board, arrived_at=arrived_at)
+        webclient.send(command)
+        if webclient._startup and "first_command" not in webclient._startup:
+            webclient._startup["first_command"] = perf_counter()
+            print(format_startup(webclient._startup))
+        if webclient._recorder:
+            webclient._recorder.record(board, command, timestamp, perf_counter() - arrived_at)
+        # the time until the next board is free, get ahead on it
+        if hasattr(webclient._solver, "speculate"):
+            webclient._solver.speculate()
     except Exception as e:
         print("Exception occurred")
         print(e)
@@ -53,17 +80,93 @@ def _on_error(webclient, error):
 
 def _on_close(webclient):
     print("WebSocket closed.")
+    if webclient._disconnected_at is None:
+        webclient._disconnected_at = perf_counter()
+
+
+def format_startup(startup):
+    """ Return the startup marks as milliseconds since the "start" mark."""
+    start = startup["start"]
+    marks = sorted((at, name) for name, at in startup.items() if name != "start")
+    return "Startup: " + ", ".join("{} {:.1f} ms".format(name, 1000 * (at - start))
+                                   for at, name in marks)
 
 
 class WebClient(WebSocketApp):
+    """ solver and recorder may be futures, they are waited for once the
+    connection is open so they can be built while connecting. startup is a
+    dict of perf_counter() marks with a "start", "connected" and
+    "first_command" are added and the breakdown is printed.
+    """
 
     def __init__(self, url, header=[],
                  on_open=None, on_message=None, on_error=None,
-                 on_close=None, keep_running=True, get_mask_key=None, solver=None):
+                 on_close=None, keep_running=True, get_mask_key=None, solver=None,
+                 recorder=None, startup=None):
         self._solver = solver
+        self._recorder = recorder
+        self._startup = startup
         self.retries = 0
+        self.reconnect_times = []
+        self._disconnected_at = None
+        # one context for all connections so TLS sessions can be resumed
+        self._ssl_context = ssl.create_default_context() if url.startswith("wss") else None
+        self._ssl_session = None
+        self._session_saved = False
         super().__init__(url, [], _on_open, _on_message, _on_error, _on_close)
 
+    def run_forever(self, reconnect=True):
+        """ Keep the connection up until close() is called.
+
+        Dropped, failed and stalled connections are retried in process with
+        jittered exponential backoff, the solver keeps its state.
+        """
+        while True:
+            sslopt = None
+            if self._ssl_context:
+                sslopt = {"context": self._ssl_context, "session": self._ssl_session}
+            super().run_forever(sslopt=sslopt, timeout=STALL_TIMEOUT)
+            if not reconnect or not self.keep_running:
+                return
+            delay = random.uniform(0, min(RECONNECT_MAX, RECONNECT_BASE * 2 ** self.retries))
+            self.retries += 1
+            print("Reconnecting in {:.2f} seconds, attempt {}".format(delay, self.retries))
+            sleep(delay)
+
+    def _connected(self):
+        if self._startup is not None:
+            self._startup.setdefault("connected", perf_counter())
+        if isinstance(self._solver, Future):
+            self._solver = self._solver.result()
+        if isinstance(self._recorder, Future):
+            self._recorder = self._recorder.result()
+        self._session_saved = False
+        if self._disconnected_at is not None:
+            seconds = perf_counter() - self._disconnected_at
+            self.reconnect_times.append(seconds)
+            resumed = getattr(self.sock.sock, "session_reused", False)
+            print("Reconnected in {:.3f} seconds after {} attempts{}".format(
+                seconds, self.retries, ", TLS session resumed" if resumed else ""))
+        self._disconnected_at = None
+        self.retries = 0
+
+    def _save_session(self):
+        # TLS 1.3 tickets come after the handshake, so look once data arrived
+        self._session_saved = True
+        sock = self.sock.sock
+        if isinstance(sock, ssl.SSLSocket) and sock.session:
+            self._ssl_session = sock.session
+
+    def reconnect_stats(self):
+        """ Return the reconnect count and times in seconds."""
+        times = sorted(self.reconnect_times)
+        return {
+            "reconnects": len(times),
+            "p50": percentile(times, 50),
+            "p95": percentile(times, 95),
+            "max": times[-1] if times else 0,
+        }
+
 
 if __name__ == '__main__':
     raise RuntimeError("This module is not designed to be ran from CLI.")
@@ -35,7 +35,6 @@ except ImportError:
 
 from urllib.parse import urlparse
 import os
-import array
 import struct
 import uuid
 import hashlib
@@ -96,6 +95,9 @@ class WebSocketTimeoutException(WebSocketException):
     pass
 
 default_timeout = None
+# host name resolutions are reused for this many seconds
+DNS_TTL = 300
+_dns_cache = {}
 traceEnabled = False
 
 
@@ -130,6 +132,19 @@ def getdefaulttimeout():
     return default_timeout
 
 
+def _resolve(hostname, port):
+    """
+    Return the address to connect to, cached for DNS_TTL seconds.
+    """
+    key = (hostname, port)
+    cached = _dns_cache.get(key)
+    if cached and time.monotonic() - cached[1] < DNS_TTL:
+        return cached[0]
+    address = socket.getaddrinfo(hostname, port, socket.AF_INET, socket.SOCK_STREAM)[0][4]
+    _dns_cache[key] = (address, time.monotonic())
+    return address
+
+
 def _parse_url(url):
     """
     parse url and the result is tuple of
@@ -202,6 +217,7 @@ def create_connection(url, timeout=None, **options):
     return websock
 
 _MAX_INTEGER = (1 << 32) -1
+_RECV_BUFFER_SIZE = 1 << 16
 _AVAILABLE_KEY_CHARS = list(range(0x21, 0x2f + 1)) + list(range(0x3a, 0x7e + 1))
 _MAX_CHAR_BYTE = (1<<8) -1
 
@@ -332,14 +348,15 @@ class ABNF(object):
 
         mask_key: 4 byte string(byte).
 
-        data: data to mask/unmask.
+        data: data to mask/unmask, any bytes-like object.
         """
-        _m = array.array("B", mask_key)
-        _d = array.array("B", data)
-        for i in range(len(_d)):
-            _d[i] ^= _m[i % 4]
-
-        return _d.tobytes()
+        length = len(data)
+        if not length:
+            return b""
+        # xor the whole buffer at once as two big integers
+        key = bytes(mask_key) * (length // 4 + 1)
+        masked = int.from_bytes(data, "little") ^ int.from_bytes(key[:length], "little")
+        return masked.to_bytes(length, "little")
 
 
 class WebSocket(object):
@@ -381,9 +398,11 @@ class WebSocket(object):
             self.sock.setsockopt(*opts)
         self.sslopt = sslopt
         self.get_mask_key = get_mask_key
-        # Buffers over the packets from the layer beneath until desired amount
-        # bytes of bytes are received.
-        self._recv_buffer = []
+        # Reused receive buffer, bytes in [_recv_start, _recv_end) are not
+        # consumed yet.
+        self._recv_buffer = bytearray(_RECV_BUFFER_SIZE)
+        self._recv_start = 0
+        self._recv_end = 0
         # These buffer over the build-up of a single frame.
         self._frame_header = None
         self._frame_length = None
@@ -440,17 +459,29 @@ class WebSocket(object):
                  if you set header as dict value,
                  the custom HTTP headers are added.
 
+        An ssl.SSLContext given as sslopt "context" is used for secure
+        connections, with the sslopt "session" to resume if there is one.
         """
         hostname, port, resource, is_secure = _parse_url(url)
         # TODO: we need to support proxy
-        self.sock.connect((hostname, port))
+        address = _resolve(hostname, port)
+        try:
+            self.sock.connect(address)
+        except OSError:
+            # the host may have moved, resolve it again next time
+            _dns_cache.pop((hostname, port), None)
+            raise
         if is_secure:
             if HAVE_SSL:
                 if self.sslopt is None:
                     sslopt = {}
                 else:
                     sslopt = self.sslopt
-                self.sock = ssl.wrap_socket(self.sock, **sslopt)
+                if "context" in sslopt:
+                    self.sock = sslopt["context"].wrap_socket(
+                        self.sock, server_hostname=hostname, session=sslopt.get("session"))
+                else:
+                    self.sock = ssl.wrap_socket(self.sock, **sslopt)
             else:
                 raise WebSocketException("SSL not available.")
 
@@ -617,14 +648,17 @@ class WebSocket(object):
                 if frame.opcode == ABNF.OPCODE_CONT and not self._cont_data:
                     raise WebSocketException("Illegal frame")
                 if self._cont_data:
-                    self._cont_data[1] += frame.data
+                    self._cont_data[1].append(frame.data)
+                elif frame.fin:
+                    return [frame.opcode, frame.data]
                 else:
-                    self._cont_data = [frame.opcode, frame.data]
-                
+                    self._cont_data = [frame.opcode, [frame.data]]
+
                 if frame.fin:
-                    data = self._cont_data
+                    # join the fragments once, growing with += copies quadratically
+                    opcode, fragments = self._cont_data
                     self._cont_data = None
-                    return data
+                    return [opcode, b"".join(fragments)]
             elif frame.opcode == ABNF.OPCODE_CLOSE:
                 self.send_close()
                 return (frame.opcode, None)
@@ -639,7 +673,7 @@ class WebSocket(object):
         """
         # Header
         if self._frame_header is None:
-            self._frame_header = self._recv_strict(2)
+            self._frame_header = bytes(self._recv_strict(2))
         b1 = self._frame_header[0]
         fin = b1 >> 7 & 1
         rsv1 = b1 >> 6 & 1
@@ -664,12 +698,14 @@ class WebSocket(object):
 
         # Mask
         if self._frame_mask is None:
-            self._frame_mask = self._recv_strict(4) if has_mask else ""
+            self._frame_mask = bytes(self._recv_strict(4)) if has_mask else ""
 
-        # Payload
+        # Payload, the view into the receive buffer is copied exactly once
         payload = self._recv_strict(self._frame_length)
         if has_mask:
             payload = ABNF.mask(self._frame_mask, payload)
+        else:
+            payload = bytes(payload)
 
         # Reset for next frame
         self._frame_header = None
@@ -732,39 +768,48 @@ class WebSocket(object):
         except socket.timeout as e:
             raise WebSocketTimeoutException(*e.args)
 
-    def _recv(self, bufsize):
-        try:
-            bytes = self.sock.recv(bufsize)
-        except socket.timeout as e:
-            raise WebSocketTimeoutException(*e.args)
-
-        if not bytes:
-            raise WebSocketConnectionClosedException()
-        return bytes
+    def _fill(self, bufsize):
+        """
+        Receive until the buffer holds at least bufsize unconsumed bytes.
+        """
+        buffer = self._recv_buffer
+        if self._recv_start + bufsize > len(buffer):
+            # move the unconsumed bytes to the front, grow if still short
+            pending = self._recv_end - self._recv_start
+            if bufsize > len(buffer):
+                buffer = bytearray(max(bufsize, 2 * len(buffer)))
+            buffer[:pending] = self._recv_buffer[self._recv_start:self._recv_end]
+            self._recv_buffer = buffer
+            self._recv_start = 0
+            self._recv_end = pending
+        view = memoryview(buffer)
+        while self._recv_end - self._recv_start < bufsize:
+            try:
+                received = self.sock.recv_into(view[self._recv_end:])
+            except socket.timeout as e:
+                raise WebSocketTimeoutException(*e.args)
+            if not received:
+                raise WebSocketConnectionClosedException()
+            self._recv_end += received
 
     def _recv_strict(self, bufsize):
-        shortage = bufsize - sum(len(x) for x in self._recv_buffer)
-        while shortage > 0:
-            bytes = self._recv(shortage)
-            self._recv_buffer.append(bytes)
-            shortage -= len(bytes)
-
-        unified = b"".join(self._recv_buffer)
-        if shortage == 0:
-            self._recv_buffer = []
-            return unified
-        else:
-            self._recv_buffer = [unified[bufsize:]]
-            return unified[:bufsize]
+        """
+        Return a view of the next bufsize bytes. The view is only valid
+        until the next receive.
+        """
+        self._fill(bufsize)
+        start = self._recv_start
+        self._recv_start += bufsize
+        if self._recv_start == self._recv_end:
+            self._recv_start = self._recv_end = 0
+        return memoryview(self._recv_buffer)[start:start + bufsize]
 
     def _recv_line(self):
-        line = []
         while True:
-            c = self._recv(1)
-            line.append(c)
-            if c == b"\n":
-                break
-        return b"".join(line).decode("utf-8")
+            end = self._recv_buffer.find(b"\n", self._recv_start, self._recv_end)
+            if end >= 0:
+                return bytes(self._recv_strict(end + 1 - self._recv_start)).decode("utf-8")
+            self._fill(self._recv_end - self._recv_start + 1)
 
 
 class WebSocketApp(object):
@@ -826,7 +871,7 @@ class WebSocketApp(object):
             time.sleep(interval)
             self.sock.ping()
 
-    def run_forever(self, sockopt=None, sslopt=None, ping_interval=0):
+    def run_forever(self, sockopt=None, sslopt=None, ping_interval=0, timeout=None):
         """
         run event loop for WebSocket framework.
         This loop is infinite loop and is alive during websocket is available.
@@ -835,6 +880,8 @@ class WebSocketApp(object):
         sslopt: ssl socket optional dict.
         ping_interval: automatically send "ping" command every specified period(second)
             if set to 0, not send automatically.
+        timeout: socket timeout(second), the loop ends with an error when
+            connecting or waiting for a frame takes longer.
         """
         if sockopt is None:
             sockopt = []
@@ -846,6 +893,7 @@ class WebSocketApp(object):
 
         try:
             self.sock = WebSocket(self.get_mask_key, sockopt=sockopt, sslopt=sslopt)
+            self.sock.settimeout(timeout)
             self.sock.connect(self.url, header=self.header)
             self._callback(self.on_open)
 
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+###
+# #%L
+# Codenjoy - it's a dojo-like platform from developers to developers.
+# %%
+# Copyright (C) 2018 Codenjoy
+# %%
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public
+# License along with this program.  If not, see
+# <http://www.gnu.org/licenses/gpl-3.0.html>.
+# #L%
+###
+
+import numpy as np
+from element import _ELEMENTS, _CODES
+
+
+def _ray_sums(values, stops, rng):
+    """ For each cell, the sum of values of the next rng cells to the right.
+
+    The sum ends at the first stop cell, which is counted, or at the end
+    of the row. Rows are processed at once with running minimums and
+    prefix sums.
+    """
+    width = values.shape[1]
+    cols = np.arange(width)
+    # the first stop cell at or after each column, the last column if none
+    nearest = np.where(stops, cols, width - 1)
+    nearest = np.minimum.accumulate(nearest[:, ::-1], axis=1)[:, ::-1]
+    after = np.empty_like(nearest)
+    after[:, :-1] = nearest[:, 1:]
+    after[:, -1] = width - 1
+    end = np.minimum(after, cols + rng)
+    prefix = np.cumsum(values, axis=1)
+    return np.take_along_axis(prefix, end, axis=1) - prefix
+
+
+def _oriented(array):
+    """ Stack a square array as seen from the right, left, bottom and top."""
+    return np.concatenate((array, array[:, ::-1], array.T, array.T[:, ::-1]))
+
+
+class YieldMap:
+    """ Value of the cells a bomb would hit, for every cell of the board.
+
+    Destroyable walls, other bombermen and choppers add their yield, rays
+    stop at walls and at mad choppers, both included. The map is built in
+    time linear in the board area.
+    """
+
+    def __init__(self, board, rng, mad_choppers=(), wall_yield=1, player_yield=20, chopper_yield=10):
+        """ rng is the blast range, perks included."""
+        self._board = board
+        self._size = board._size
+        self._rng = rng
+        self._mad_choppers = list(mad_choppers)
+        self._mad = board.points_mask(self._mad_choppers)
+        codes = board.as_array()
+        lut = np.zeros(len(_CODES), dtype=np.int64)
+        lut[_CODES[_ELEMENTS['DESTROY_WALL']]] = wall_yield
+        lut[_CODES[_ELEMENTS['OTHER_BOMBERMAN']]] = player_yield
+        lut[_CODES[_ELEMENTS['MEAT_CHOPPER']]] = chopper_yield
+        values = np.where(self._mad, chopper_yield, lut[codes])
+        stops = board.get_mask({_ELEMENTS['WALL'], _ELEMENTS['DESTROY_WALL']}) | self._mad
+        # the four directions as rows of one array, all rays run to the right
+        size = self._size
+        sums = _ray_sums(_oriented(values), _oriented(stops), rng)
+        right, left, down, up = sums[:size], sums[size:2 * size], sums[2 * size:3 * size], sums[3 * size:]
+        self.values = right + left[:, ::-1] + down.T + up[:, ::-1].T
+
+    def get(self, pnt):
+        """ Return the yield of a bomb at the point, 0 out of the board."""
+        if pnt.is_bad(self._size):
+            return 0
+        return int(self.values[pnt.get_y(), pnt.get_x()])
+
+    def best(self, distances):
+        """ Return the point with the most yield per step, None if nothing pays.
+
+        distances is a [y, x] array of path costs, inf where not reachable,
+        closer spots are preferred as yield / (1 + distance).
+        """
+        score = self.values / (1 + distances)
+        i = int(np.argmax(score))
+        if not score.flat[i] > 0:
+            return None
+        return self._board._points.at(i)
+
+    def get_targets(self, pnt):
+        """ Return the destroyable walls a bomb at the point would hit, nearest first."""
+        bits = self._board.get_bitboard()
+        stop = bits.of({_ELEMENTS['WALL'], _ELEMENTS['DESTROY_WALL']}) | bits.from_points(self._mad_choppers)
+        _, stopped = bits.rays(bits.from_points((pnt,)), self._rng, stop)
+        walls = bits.points(stopped & bits.of({_ELEMENTS['DESTROY_WALL']}))
+        return sorted(walls, key=lambda wall: wall.distance(pnt))
+
+
+if __name__ == '__main__':
+    raise RuntimeError("This module is not designed to be ran from CLI")